@@ -7,11 +7,10 @@
    "metadata": {},
    "outputs": [],
    "source": [
-    "from transformers import BartTokenizer, BartForConditionalGeneration\n",
+    "from summarization import registry, summarize\n",
     "\n",
-    "# Load the BART tokenizer and model\n",
-    "tokenizer = BartTokenizer.from_pretrained('facebook/bart-large-cnn')\n",
-    "model = BartForConditionalGeneration.from_pretrained('facebook/bart-large-cnn')"
+    "# The BART tokenizer and model are loaded by the first summarize() call and\n",
+    "# shared by every later call in this process, see summarization/registry.py"
    ]
   },
   {
@@ -21,29 +20,9 @@
    "metadata": {},
    "outputs": [],
    "source": [
-    "\n",
-    "def summarize(text, max_length=150, min_length=30, num_beams=4):\n",
-    "    \"\"\"\n",
-    "    Summarizes the given text using the BART model.\n",
-    "    \n",
-    "    Parameters:\n",
-    "    text (str): The text to be summarized.\n",
-    "    max_length (int): The maximum length of the summary.\n",
-    "    min_length (int): The minimum length of the summary.\n",
-    "    num_beams (int): The number of beams for beam search. More beams result in better performance but are slower.\n",
-    "    \n",
-    "    Returns:\n",
-    "    str: The generated summary.\n",
-    "    \"\"\"\n",
-    "    # Tokenize the input text\n",
-    "    inputs = tokenizer.encode(\"summarize: \" + text, return_tensors='pt', max_length=512, truncation=True)\n",
-    "    \n",
-    "    # Generate the summary\n",
-    "    summary_ids = model.generate(inputs, max_length=max_length, min_length=min_length, num_beams=num_beams, length_penalty=2.0, early_stopping=True)\n",
-    "    \n",
-    "    # Decode the summary\n",
-    "    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)\n",
-    "    return summary"
+    "# Load the model up front and report what it cost\n",
+    "loaded = registry.get()\n",
+    "print(f\"Loaded {loaded.key[0]} in {loaded.load_seconds:.1f}s (+{loaded.rss_bytes / 2**20:.0f} MB resident)\")"
    ]
   },
   {
@@ -105,9 +84,9 @@
     }
    ],
    "source": [
-    "from datasets import load_dataset\n",
+    "from summarization.snapshot import load_dataset\n",
     "\n",
-    "# Load the CNN/DailyMail dataset\n",
+    "# Load the CNN/DailyMail dataset, from the local snapshot when SUMMARIZATION_SNAPSHOT is set\n",
     "dataset = load_dataset('cnn_dailymail', '3.0.0')\n",
     "\n",
     "# Get an example article and its reference summary\n",
@@ -115,8 +94,8 @@
     "article = example['article']\n",
     "highlights = example['highlights']\n",
     "\n",
-    "# Summarize the article\n",
-    "summary = summarize(article)\n",
+    "# Summarize the whole article; long_input splits it into windows instead of truncating at 512 tokens\n",
+    "summary = summarize(article, long_input=True)\n",
     "print(\"Original Text:\\n\", article)\n",
     "print(\"\\nReference Summary:\\n\", highlights)\n",
     "print(\"\\nGenerated Summary:\\n\", summary)"
@@ -138,22 +117,7 @@
     }
    ],
    "source": [
-    "from rouge_score import rouge_scorer\n",
-    "\n",
-    "def compute_rouge_scores(reference, generated):\n",
-    "    \"\"\"\n",
-    "    Computes ROUGE scores between the reference and generated summaries.\n",
-    "    \n",
-    "    Parameters:\n",
-    "    reference (str): The reference summary.\n",
-    "    generated (str): The generated summary.\n",
-    "    \n",
-    "    Returns:\n",
-    "    dict: A dictionary containing the ROUGE scores.\n",
-    "    \"\"\"\n",
-    "    scorer = rouge_scorer.RougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)\n",
-    "    scores = scorer.score(reference, generated)\n",
-    "    return scores\n",
+    "from summarization.evaluation import compute_rouge_scores\n",
     "\n",
     "# Compute ROUGE scores\n",
     "rouge_scores = compute_rouge_scores(highlights, summary)\n",
@@ -247,37 +211,15 @@
     }
    ],
    "source": [
-    "def batch_summarize_and_evaluate(dataset, num_samples=10):\n",
-    "    \"\"\"\n",
-    "    Summarizes multiple articles and evaluates using ROUGE scores.\n",
-    "    \n",
-    "    Parameters:\n",
-    "    dataset: The dataset containing articles and summaries.\n",
-    "    num_samples (int): The number of samples to summarize and evaluate.\n",
-    "    \n",
-    "    Returns:\n",
-    "    list: A list of dictionaries containing the original text, reference summary, generated summary, and ROUGE scores.\n",
-    "    \"\"\"\n",
-    "    results = []\n",
-    "    for i in range(num_samples):\n",
-    "        example = dataset['test'][i]\n",
-    "        article = example['article']\n",
-    "        highlights = example['highlights']\n",
-    "        \n",
-    "        summary = summarize(article)\n",
-    "        rouge_scores = compute_rouge_scores(highlights, summary)\n",
-    "        \n",
-    "        results.append({\n",
-    "            'article': article,\n",
-    "            'reference_summary': highlights,\n",
-    "            'generated_summary': summary,\n",
-    "            'rouge_scores': rouge_scores\n",
-    "        })\n",
-    "    \n",
-    "    return results\n",
+    "from summarization.aggregate import RougeAggregator\n",
+    "from summarization.bucketing import PaddingStats\n",
+    "from summarization.evaluation import batch_summarize_and_evaluate\n",
     "\n",
-    "# Summarize and evaluate multiple samples\n",
-    "results = batch_summarize_and_evaluate(dataset, num_samples=5)\n",
+    "# Summarize and evaluate multiple samples; articles are grouped into length-sorted batches under a token budget\n",
+    "padding = PaddingStats()\n",
+    "aggregator = RougeAggregator()\n",
+    "results = batch_summarize_and_evaluate(dataset, num_samples=5, padding_stats=padding, aggregator=aggregator)\n",
+    "print(f\"Padding: {padding.padding_ratio_before:.0%} unbucketed, {padding.padding_ratio_after:.0%} bucketed\")\n",
     "\n",
     "# Print results\n",
     "for i, result in enumerate(results):\n",
@@ -285,7 +227,39 @@
     "    print(\"Original Text:\\n\", result['article'])\n",
     "    print(\"\\nReference Summary:\\n\", result['reference_summary'])\n",
     "    print(\"\\nGenerated Summary:\\n\", result['generated_summary'])\n",
-    "    print(\"\\nROUGE Scores:\\n\", result['rouge_scores'])"
+    "    print(\"\\nROUGE Scores:\\n\", result['rouge_scores'])\n",
+    "\n",
+    "# Mean, median and 95% bootstrap confidence interval of each ROUGE F-measure\n",
+    "print(\"\\nAggregate ROUGE:\\n\", aggregator.summary())"
+   ]
+  },
+  {
+   "cell_type": "code",
+   "execution_count": None,
+   "id": "7bfcf873-1edb-f480-8d05-46cc17c7d7a4",
+   "metadata": {},
+   "outputs": [],
+   "source": [
+    "# Compare ROUGE with and without extractive pre-selection of the most salient sentences\n",
+    "for extractive in (False, True):\n",
+    "    comparison = RougeAggregator()\n",
+    "    batch_summarize_and_evaluate(dataset, num_samples=20, aggregator=comparison, keep_text=False, extractive=extractive)\n",
+    "    print(\"extractive\" if extractive else \"truncated \", comparison.progress())"
+   ]
+  },
+  {
+   "cell_type": "code",
+   "execution_count": None,
+   "id": "0edff77e-8e78-4d66-a669-9ad244866cb3",
+   "metadata": {},
+   "outputs": [],
+   "source": [
+    "from summarization.precision import precision_report\n",
+    "\n",
+    "# Compare fp32, int8 and bf16 inference on a fixed sample before picking a serving precision\n",
+    "samples = list(zip(dataset['test'][:20]['article'], dataset['test'][:20]['highlights']))\n",
+    "for precision, entry in precision_report(samples).items():\n",
+    "    print(precision, entry)"
    ]
   },
   {
@@ -309,22 +283,57 @@
    ],
    "source": [
     "# Save this as app.py\n",
+    "import time\n",
+    "\n",
     "import streamlit as st\n",
+    "from summarization import default_scheduler, encoder_cache, metrics, stream_summarize\n",
+    "from summarization.executor import default_executor\n",
     "\n",
-    "# Define the summarization function\n",
-    "def summarize(text, max_length=150, min_length=30, num_beams=4):\n",
-    "    inputs = tokenizer.encode(\"summarize: \" + text, return_tensors='pt', max_length=512, truncation=True)\n",
-    "    summary_ids = model.generate(inputs, max_length=max_length, min_length=min_length, num_beams=num_beams, length_penalty=2.0, early_stopping=True)\n",
-    "    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)\n",
-    "    return summary\n",
+    "# The model is loaded by the first summary and then shared by every session\n",
+    "# and rerun served by this process. Beam search requests from concurrent\n",
+    "# sessions are batched into shared generate calls by the scheduler.\n",
+    "scheduler = default_scheduler()\n",
+    "# Every session's generate calls run on the executor's workers, which split the\n",
+    "# cores between them instead of oversubscribing them (SUMMARIZATION_CONCURRENCY)\n",
+    "executor = default_executor()\n",
+    "\n",
+    "# Collect per-stage timings for the debug panel\n",
+    "metrics.add_hook(metrics.recent)\n",
+    "metrics.add_hook(metrics.prometheus)\n",
     "\n",
     "# Streamlit app\n",
     "st.title(\"Text Summarization with BART\")\n",
     "text = st.text_area(\"Enter text to summarize\", height=200)\n",
+    "mode = st.radio(\"Decoding\", [\"Greedy (streamed)\", \"Sampling (streamed)\", \"Beam search\"], horizontal=True)\n",
     "if st.button(\"Summarize\"):\n",
-    "    summary = summarize(text)\n",
     "    st.write(\"**Summary:**\")\n",
-    "    st.write(summary)\n",
+    "    if mode == \"Beam search\":\n",
+    "        started = time.perf_counter()\n",
+    "        st.write(scheduler.summarize(text))\n",
+    "        st.caption(f\"Summary after {(time.perf_counter() - started) * 1000:.0f} ms\")\n",
+    "    else:\n",
+    "        # Render the summary as it is generated\n",
+    "        stream = stream_summarize(text, do_sample=mode.startswith(\"Sampling\"))\n",
+    "        placeholder = st.empty()\n",
+    "        for _ in stream:\n",
+    "            placeholder.write(stream.text)\n",
+    "        if stream.time_to_first_token is not None:\n",
+    "            st.caption(f\"First token after {stream.time_to_first_token * 1000:.0f} ms, \"\n",
+    "                       f\"full summary after {stream.total_seconds * 1000:.0f} ms\")\n",
+    "\n",
+    "with st.expander(\"Debug\"):\n",
+    "    record = metrics.recent.last()\n",
+    "    if record is None:\n",
+    "        st.write(\"No summaries generated yet.\")\n",
+    "    else:\n",
+    "        st.write(\"**Last generate call**\")\n",
+    "        st.json(record.as_dict())\n",
+    "    st.write(\"**Inference executor**\")\n",
+    "    st.json(executor.as_dict())\n",
+    "    st.write(\"**Encoder cache**\")\n",
+    "    st.json(encoder_cache.stats())\n",
+    "    st.write(\"**Metrics**\")\n",
+    "    st.code(metrics.prometheus.exposition(), language='text')\n",
     "\n",
     "# Run the Streamlit app\n",
     "# !streamlit run app.py"
@@ -0,0 +1,20 @@
+"""
+Text summarization with BART.
+"""
+from . import metrics
+from .batching import BatchScheduler, default_scheduler
+from .cache import EncoderCache, SummaryCache, encoder_cache, summary_cache
+from .core import summarize, summarize_batch
+from .dedup import summarize_deduplicated
+from .longdoc import summarize_long
+from .registry import DEFAULT_MODEL, ModelRegistry, registry
+from .streaming import SummaryStream, stream_summarize
+
+__all__ = [
+    'summarize', 'summarize_batch', 'summarize_long', 'summarize_deduplicated',
+    'stream_summarize', 'SummaryStream',
+    'BatchScheduler', 'default_scheduler',
+    'SummaryCache', 'summary_cache', 'EncoderCache', 'encoder_cache',
+    'DEFAULT_MODEL', 'ModelRegistry', 'registry',
+    'metrics',
+]
@@ -0,0 +1,116 @@
+"""
+Incremental aggregation of ROUGE scores.
+
+``RougeAggregator`` keeps every sample's precision, recall and F-measure
+in compact ``array('d')`` columns instead of the per-sample result
+dictionaries, so an evaluation over the whole test split only holds a few
+floats per sample. Means are kept as running sums; medians and bootstrap
+confidence intervals are computed from the columns on demand.
+"""
+import array
+import random
+import statistics
+
+FIELDS = ('precision', 'recall', 'fmeasure')
+
+
+class RougeAggregator:
+    """
+    Streams per-sample ROUGE scores into numeric columns.
+
+    Parameters:
+    rouge_types (tuple): The ROUGE types to aggregate.
+    """
+
+    def __init__(self, rouge_types=('rouge1', 'rouge2', 'rougeL')):
+        self.rouge_types = tuple(rouge_types)
+        self._values = {(t, f): array.array('d') for t in self.rouge_types for f in FIELDS}
+        self._sums = dict.fromkeys(self._values, 0.0)
+
+    def __len__(self):
+        return len(self._values[(self.rouge_types[0], FIELDS[0])])
+
+    def add(self, scores):
+        """
+        Adds one sample's scores, a dictionary of Score tuples keyed by ROUGE type.
+        """
+        for rouge_type in self.rouge_types:
+            for field, value in zip(FIELDS, scores[rouge_type]):
+                self._values[(rouge_type, field)].append(value)
+                self._sums[(rouge_type, field)] += value
+
+    def values(self, rouge_type, field='fmeasure'):
+        return self._values[(rouge_type, field)]
+
+    def mean(self, rouge_type, field='fmeasure'):
+        return self._sums[(rouge_type, field)] / len(self) if len(self) else 0.0
+
+    def median(self, rouge_type, field='fmeasure'):
+        return statistics.median(self.values(rouge_type, field)) if len(self) else 0.0
+
+    def bootstrap_ci(self, rouge_type, field='fmeasure', confidence=0.95, resamples=1000, seed=0):
+        """
+        Returns a percentile bootstrap confidence interval of the mean.
+
+        Parameters:
+        rouge_type (str): The ROUGE type.
+        field (str): One of precision, recall or fmeasure.
+        confidence (float): The coverage of the interval.
+        resamples (int): The number of bootstrap resamples.
+        seed (int): The random seed, fixed so repeated reports agree.
+
+        Returns:
+        tuple: The (low, high) bounds, or (0.0, 0.0) with no samples.
+        """
+        values = self.values(rouge_type, field)
+        n = len(values)
+        if not n:
+            return 0.0, 0.0
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+
+        if np is not None:
+            data = np.frombuffer(values, dtype=np.float64)
+            rng = np.random.default_rng(seed)
+            means = np.empty(resamples)
+            # Draw resamples in chunks so memory stays bounded for large n
+            chunk = max(1, 2**22 // n)
+            for start in range(0, resamples, chunk):
+                count = min(chunk, resamples - start)
+                means[start:start + count] = data[rng.integers(0, n, size=(count, n))].mean(axis=1)
+            means.sort()
+        else:
+            rng = random.Random(seed)
+            means = sorted(sum(rng.choices(values, k=n)) / n for _ in range(resamples))
+
+        tail = (1 - confidence) / 2
+        low = means[int(tail * (resamples - 1))]
+        high = means[int(round((1 - tail) * (resamples - 1)))]
+        return float(low), float(high)
+
+    def summary(self, confidence=0.95, resamples=1000, field='fmeasure'):
+        """
+        Returns the mean, median and confidence interval of every ROUGE type.
+
+        Returns:
+        dict: Per ROUGE type, a dictionary with mean, median, ci_low and ci_high.
+        """
+        report = {'samples': len(self)}
+        for rouge_type in self.rouge_types:
+            low, high = self.bootstrap_ci(rouge_type, field, confidence, resamples)
+            report[rouge_type] = {
+                'mean': self.mean(rouge_type, field),
+                'median': self.median(rouge_type, field),
+                'ci_low': low,
+                'ci_high': high,
+            }
+        return report
+
+    def progress(self):
+        """
+        Returns a one-line summary of the running mean F-measures.
+        """
+        means = ', '.join(f"{t} {self.mean(t):.4f}" for t in self.rouge_types)
+        return f"{len(self)} samples: {means}"
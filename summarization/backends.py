@@ -0,0 +1,240 @@
+"""
+Inference backends that run the encoder and the decoding loop.
+
+``summarize`` and friends tokenize and detokenize themselves and hand the
+padded input ids to a backend, which runs the encoder and the beam/greedy
+search and returns the generated ids:
+
+- ``torch``: the PyTorch model, optionally int8-quantized or bf16, see
+  ``summarization.precision``.
+- ``onnx``: the model exported to ONNX as an encoder plus a decoder with
+  past key/values, run with ONNX Runtime on CPU. With the ``int8``
+  precision, the exported graphs are dynamically quantized.
+
+The backend is chosen per process through the ``SUMMARIZATION_BACKEND``
+environment variable, or by setting ``registry.backend``. Exported
+models are kept under ``SUMMARIZATION_ONNX_DIR`` so the export only runs
+once per model.
+
+``compare_backends`` checks that the backends produce the same summaries
+and reports what each costs in latency.
+"""
+import os
+import time
+
+BACKENDS = ('torch', 'onnx')
+DEFAULT_BACKEND = os.environ.get('SUMMARIZATION_BACKEND', 'torch')
+ONNX_DIR = os.environ.get('SUMMARIZATION_ONNX_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'summarization', 'onnx'))
+
+# Precisions the ONNX backend can run, see ``export_onnx``
+ONNX_PRECISIONS = ('float32', 'int8')
+_ONNX_FILES = ('encoder_model.onnx', 'decoder_model.onnx', 'decoder_with_past_model.onnx')
+
+
+class InferenceBackend:
+    """
+    Runs the encoder and the decoding loop for already tokenized inputs.
+
+    Attributes:
+    name (str): The backend name, one of BACKENDS.
+    model: The underlying model. It exposes ``generate`` and ``config``
+    like a transformers model, so streaming can use it directly. Assisted generation
+    needs the torch model's cache layout and only runs on the torch backend.
+    """
+    name = None
+
+    def __init__(self, model):
+        self.model = model
+
+    @property
+    def config(self):
+        return self.model.config
+
+    def encode(self, input_ids, attention_mask):
+        """
+        Runs the encoder.
+
+        Returns:
+        The encoder outputs, as accepted by ``generate``.
+        """
+        raise NotImplementedError
+
+    def generate(self, encoder_outputs, attention_mask, **generation):
+        """
+        Runs the decoding loop on encoder outputs.
+
+        Parameters:
+        encoder_outputs: The result of ``encode``.
+        attention_mask: The attention mask of the encoded inputs.
+        **generation: Generation parameters such as ``max_length`` and ``num_beams``.
+
+        Returns:
+        torch.Tensor: The generated ids, one row per input.
+        """
+        return self.model.generate(encoder_outputs=encoder_outputs, attention_mask=attention_mask, **generation)
+
+
+class TorchBackend(InferenceBackend):
+    """
+    Runs the PyTorch model.
+    """
+    name = 'torch'
+
+    def encode(self, input_ids, attention_mask):
+        import torch
+
+        with torch.no_grad():
+            return self.model.get_encoder()(input_ids=input_ids, attention_mask=attention_mask)
+
+
+class OnnxBackend(InferenceBackend):
+    """
+    Runs an exported model with ONNX Runtime on CPU.
+    """
+    name = 'onnx'
+
+    def encode(self, input_ids, attention_mask):
+        return self.model.encoder(input_ids=input_ids, attention_mask=attention_mask)
+
+
+def onnx_path(model_name, precision='float32', root=None):
+    """
+    Returns the directory an exported model is kept in.
+    """
+    name = model_name.strip('/\\').replace('/', '--').replace('\\', '--')
+    return os.path.join(root or ONNX_DIR, name + ('-int8' if precision == 'int8' else ''))
+
+
+def export_onnx(model_name, precision='float32', root=None):
+    """
+    Exports a model to ONNX unless it has been exported already.
+
+    The export writes an encoder, a decoder for the first step and a
+    decoder that takes the past key/values for every later step. For the
+    ``int8`` precision, the fp32 export is dynamically quantized.
+
+    Parameters:
+    model_name (str): The Hugging Face model id or local path.
+    precision (str): One of ONNX_PRECISIONS.
+    root (str): The export directory, defaults to ONNX_DIR.
+
+    Returns:
+    str: The directory holding the exported model.
+    """
+    if precision not in ONNX_PRECISIONS:
+        raise ValueError(f"The onnx backend supports {', '.join(ONNX_PRECISIONS)}, not {precision!r}")
+    path = onnx_path(model_name, precision, root)
+    if os.path.exists(os.path.join(path, 'config.json')):
+        return path
+
+    fp32_path = onnx_path(model_name, 'float32', root)
+    if not os.path.exists(os.path.join(fp32_path, 'config.json')):
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True).save_pretrained(fp32_path)
+    if precision == 'int8':
+        from optimum.onnxruntime import ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for file_name in _ONNX_FILES:
+            quantizer = ORTQuantizer.from_pretrained(fp32_path, file_name=file_name)
+            quantizer.quantize(save_dir=path, quantization_config=config)
+    return path
+
+
+def load_backend(backend, model_name, precision, device):
+    """
+    Loads a model for the given backend.
+
+    Parameters:
+    backend (str): One of BACKENDS.
+    model_name (str): The Hugging Face model id or local path.
+    precision (str): The inference precision.
+    device (str): The device to run on. The onnx backend only runs on CPU.
+
+    Returns:
+    InferenceBackend: The loaded backend.
+    """
+    if backend == 'torch':
+        from transformers import BartForConditionalGeneration
+
+        from .precision import apply_precision
+
+        model = BartForConditionalGeneration.from_pretrained(model_name)
+        model.to(device)
+        model.eval()
+        return TorchBackend(apply_precision(model, precision, device))
+    if backend == 'onnx':
+        if device != 'cpu':
+            raise ValueError("The onnx backend only runs on CPU")
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        path = export_onnx(model_name, precision)
+        suffix = '_quantized' if precision == 'int8' else ''
+        model = ORTModelForSeq2SeqLM.from_pretrained(
+            path, provider='CPUExecutionProvider', encoder_file_name=f'encoder_model{suffix}.onnx',
+            decoder_file_name=f'decoder_model{suffix}.onnx',
+            decoder_with_past_file_name=f'decoder_with_past_model{suffix}.onnx')
+        return OnnxBackend(model)
+    raise ValueError(f"Unknown backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+
+def compare_backends(texts, backends=BACKENDS, model_name=None, dtype='float32', **generation):
+    """
+    Checks that backends produce the same summaries and compares their latency.
+
+    Every backend summarizes the same texts one at a time with the summary
+    and encoder caches disabled. The first backend is the reference the others are
+    compared against.
+
+    Parameters:
+    texts (list): The fixed sample of texts.
+    backends (tuple): The backends to compare.
+    model_name (str): The model to load, defaults to the registry's default.
+    dtype (str): The inference precision.
+    **generation: Generation parameters passed on to ``summarize_batch``.
+
+    Returns:
+    dict: For each backend, its load time, mean and p95 latency, the fraction
+    of summaries identical to the reference backend's and their mean ROUGE-L F-measure against them.
+    """
+    from .core import summarize_batch
+    from .evaluation import get_scorer
+    from .registry import DEFAULT_MODEL, registry
+
+    model_name = model_name or DEFAULT_MODEL
+    selected = registry.backend
+    outputs, report = {}, {}
+    try:
+        for backend in backends:
+            registry.backend = backend
+            loaded = registry.get(model_name, dtype)
+            # Warm up outside the timed calls
+            summarize_batch(texts[:1], model_name=model_name, dtype=dtype, cache=None, encoder_cache=None,
+                            **generation)
+            outputs[backend], latencies = [], []
+            for text in texts:
+                start = time.perf_counter()
+                outputs[backend].extend(summarize_batch([text], model_name=model_name, dtype=dtype, cache=None,
+                                                        encoder_cache=None, **generation))
+                latencies.append(time.perf_counter() - start)
+            latencies.sort()
+            report[backend] = {
+                'load_seconds': loaded.load_seconds,
+                'mean_latency': sum(latencies) / len(latencies),
+                'p95_latency': latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)],
+            }
+    finally:
+        registry.backend = selected
+
+    scorer = get_scorer()
+    reference = outputs[backends[0]]
+    for backend in backends:
+        scores = [scorer.score(expected, summary)['rougeL'].fmeasure
+                  for expected, summary in zip(reference, outputs[backend])]
+        report[backend]['match_rate'] = sum(a == b for a, b in zip(reference, outputs[backend])) / len(texts)
+        report[backend]['rougeL_vs_reference'] = sum(scores) / len(scores)
+        report[backend]['speedup'] = report[backends[0]]['mean_latency'] / report[backend]['mean_latency']
+    return report
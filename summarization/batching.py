@@ -0,0 +1,246 @@
+"""
+Dynamic micro-batching in front of ``summarize_batch``.
+
+Concurrent callers (e.g. several Streamlit sessions) submit single texts.
+A background worker collects whatever arrives within a short window and
+runs it as one padded ``model.generate`` call, then hands each summary
+back to the caller's future.
+"""
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .bucketing import DEFAULT_TOKEN_BUDGET, PaddingStats, token_budget_batches, token_lengths
+from .core import summarize_batch
+from .registry import DEFAULT_DEVICE, DEFAULT_DTYPE, DEFAULT_MODEL, registry
+
+_STOP = object()
+
+
+class _Request:
+    __slots__ = ('text', 'params', 'future', 'submitted')
+
+    def __init__(self, text, params):
+        self.text = text
+        self.params = params
+        self.future = Future()
+        self.submitted = time.perf_counter()
+
+
+class BatchStats:
+    """
+    Counters describing how well requests are being batched.
+
+    Attributes:
+    batches (int): Number of ``generate`` calls made.
+    requests (int): Number of requests served.
+    fill_rate (float): Mean batch size as a fraction of the maximum batch size.
+    mean_queue_delay (float): Mean seconds a request waited before its batch started.
+    max_queue_delay (float): Longest such wait, in seconds.
+    """
+
+    def __init__(self, max_batch_size, window=1000):
+        self.max_batch_size = max_batch_size
+        self.batches = 0
+        self.requests = 0
+        self.max_queue_delay = 0.0
+        self._total_queue_delay = 0.0
+        self._recent_delays = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, batch_size, queue_delays):
+        with self._lock:
+            self.batches += 1
+            self.requests += batch_size
+            self._total_queue_delay += sum(queue_delays)
+            self.max_queue_delay = max(self.max_queue_delay, *queue_delays)
+            self._recent_delays.extend(queue_delays)
+
+    @property
+    def fill_rate(self):
+        if not self.batches:
+            return 0.0
+        return self.requests / (self.batches * self.max_batch_size)
+
+    @property
+    def mean_queue_delay(self):
+        return self._total_queue_delay / self.requests if self.requests else 0.0
+
+    def queue_delay_percentile(self, q):
+        """
+        Returns the q-th percentile (0-100) of recent queueing delays, in seconds.
+        """
+        with self._lock:
+            delays = sorted(self._recent_delays)
+        if not delays:
+            return 0.0
+        return delays[min(int(len(delays) * q / 100), len(delays) - 1)]
+
+    def as_dict(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'fill_rate': self.fill_rate,
+            'mean_queue_delay': self.mean_queue_delay,
+            'p95_queue_delay': self.queue_delay_percentile(95),
+            'max_queue_delay': self.max_queue_delay,
+        }
+
+
+class BatchScheduler:
+    """
+    Collects concurrent summarize requests into batched generate calls.
+
+    Parameters:
+    max_batch_size (int): The largest number of texts sent to one generate call.
+    max_wait_ms (float): How long the first request of a batch waits for others to join it.
+    summarize_fn (callable): The batch summarization function, called as ``summarize_fn(texts, **params)``.
+    token_budget (int): If set, each collected batch is split into length-bucketed
+        generate calls of at most this many padded tokens (see ``summarization.bucketing``).
+    length_fn (callable): Returns the token lengths of a list of texts, called as
+        ``length_fn(texts, **params)``. Defaults to the registry tokenizer of the requested model.
+    """
+
+    def __init__(self, max_batch_size=8, max_wait_ms=10, summarize_fn=summarize_batch, token_budget=None,
+                 length_fn=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.summarize_fn = summarize_fn
+        self.token_budget = token_budget
+        self.length_fn = length_fn or _token_lengths
+        self.stats = BatchStats(max_batch_size)
+        self.padding = PaddingStats()
+        self._queue = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name='summarize-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, text, **params):
+        """
+        Queues a text for summarization.
+
+        Parameters:
+        text (str): The text to be summarized.
+        **params: Generation parameters accepted by ``summarize_batch``.
+
+        Returns:
+        Future: Resolves to the generated summary.
+        """
+        if self._closed:
+            raise RuntimeError('BatchScheduler is closed')
+        request = _Request(text, params)
+        self._queue.put(request)
+        return request.future
+
+    def summarize(self, text, timeout=None, **params):
+        """
+        Summarizes a text through the batching worker and waits for the result.
+        """
+        return self.submit(text, **params).result(timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def close(self):
+        """
+        Stops the worker once the requests already queued have been served.
+        """
+        if not self._closed:
+            self._closed = True
+            self._queue.put(_STOP)
+            self._worker.join()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                # Serve what has been collected, then stop
+                self._queue.put(_STOP)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # Drop requests cancelled while queued; the rest can no longer be cancelled
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            try:
+                self._serve(batch)
+            except BaseException as exc:
+                # Fail this batch but keep the worker alive for later requests
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(exc)
+
+    def _serve(self, batch):
+        # Only requests with identical generation parameters can share a generate call
+        groups = collections.defaultdict(list)
+        for request in batch:
+            groups[tuple(sorted(request.params.items()))].append(request)
+        for requests in groups.values():
+            if self.token_budget is None:
+                self._execute(requests)
+                continue
+            try:
+                lengths = self.length_fn([r.text for r in requests], **requests[0].params)
+            except BaseException as exc:
+                for request in requests:
+                    request.future.set_exception(exc)
+                continue
+            batches = token_budget_batches(lengths, self.token_budget)
+            self.padding.record(lengths, batches, [list(range(len(requests)))])
+            for indices in batches:
+                self._execute([requests[i] for i in indices])
+
+    def _execute(self, requests):
+        started = time.perf_counter()
+        self.stats.record(len(requests), [started - r.submitted for r in requests])
+        try:
+            summaries = self.summarize_fn([r.text for r in requests], **requests[0].params)
+        except BaseException as exc:
+            for request in requests:
+                request.future.set_exception(exc)
+            return
+        for request, summary in zip(requests, summaries):
+            request.future.set_result(summary)
+
+
+def _token_lengths(texts, model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE, **params):
+    tokenizer = registry.get(model_name, dtype, device).tokenizer
+    if 'max_input_tokens' in params:
+        return token_lengths(texts, tokenizer, params['max_input_tokens'])
+    return token_lengths(texts, tokenizer)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    """
+    Returns the scheduler shared by every caller in this process.
+
+    Returns:
+    BatchScheduler: The process-wide scheduler, created on first use.
+    """
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = BatchScheduler(token_budget=DEFAULT_TOKEN_BUDGET)
+        return _default_scheduler
@@ -0,0 +1,309 @@
+"""
+Latency and throughput benchmark for the summarization path.
+
+Drives ``summarize_batch`` over a matrix of input lengths, beam counts,
+summary lengths, batch sizes and torch thread counts, using texts built
+from a local fixture corpus so the run never touches the hub dataset.
+Results are written as JSON and can be compared against a saved baseline.
+
+Usage:
+python -m summarization.benchmark --output bench.json
+python -m summarization.benchmark --output bench.json --baseline baseline.json
+python -m summarization.benchmark --backend onnx --compare-backends torch,onnx
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+from .backends import BACKENDS, compare_backends
+from .core import DRAFT_MODEL, summarize_batch
+from .registry import DEFAULT_MODEL, registry
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'benchmark_corpus.txt')
+
+DEFAULT_INPUT_LENGTHS = (64, 256, 512)
+DEFAULT_NUM_BEAMS = (1, 2, 4, 8)
+DEFAULT_MAX_LENGTHS = (60, 150)
+DEFAULT_BATCH_SIZES = (1, 4)
+
+
+def load_corpus(path=CORPUS_PATH):
+    """
+    Reads the fixture corpus, one document per blank-line separated paragraph.
+    """
+    with open(path, encoding='utf-8') as f:
+        return [paragraph.strip() for paragraph in f.read().split('\n\n') if paragraph.strip()]
+
+
+def make_inputs(tokenizer, corpus, num_tokens, count):
+    """
+    Builds ``count`` distinct texts of exactly ``num_tokens`` tokens each.
+
+    Each text starts at a different corpus document and continues through
+    the following ones until it is long enough, then is cut at the token
+    count and decoded back to text.
+    """
+    ids = [tokenizer.encode(document, add_special_tokens=False) for document in corpus]
+    texts = []
+    for i in range(count):
+        tokens = []
+        for document in itertools.islice(itertools.cycle(ids), i % len(ids), None):
+            tokens.extend(document)
+            if len(tokens) >= num_tokens:
+                break
+        texts.append(tokenizer.decode(tokens[:num_tokens]))
+    return texts
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+def peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return usage / 2**20 if sys.platform == 'darwin' else usage / 2**10
+
+
+def run_case(tokenizer, texts, batch_size, repeats, **generation):
+    """
+    Times repeated batched generate calls for one configuration.
+
+    Returns:
+    dict: Latency percentiles per batch in seconds and generated tokens per second.
+    """
+    batch = texts[:batch_size]
+    # Warm up so one-off allocations are not counted
+    summarize_batch(batch, cache=None, encoder_cache=None, **generation)
+
+    latencies, tokens = [], 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        summaries = summarize_batch(batch, cache=None, encoder_cache=None, **generation)
+        latencies.append(time.perf_counter() - start)
+        tokens += sum(len(ids) for ids in tokenizer(summaries)['input_ids'])
+    return {
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+        'mean': sum(latencies) / len(latencies),
+        'tokens_per_sec': tokens / sum(latencies),
+    }
+
+
+def run_benchmark(input_lengths=DEFAULT_INPUT_LENGTHS, num_beams=DEFAULT_NUM_BEAMS, max_lengths=DEFAULT_MAX_LENGTHS,
+                  batch_sizes=DEFAULT_BATCH_SIZES, thread_counts=None, repeats=5, model_name=DEFAULT_MODEL,
+                  dtype='float32', corpus_path=CORPUS_PATH):
+    """
+    Runs every combination of the given parameters.
+
+    Parameters:
+    input_lengths (tuple): Input sizes in tokens.
+    num_beams (tuple): Beam counts.
+    max_lengths (tuple): Maximum summary lengths.
+    batch_sizes (tuple): Texts per generate call.
+    thread_counts (tuple): torch intra-op thread counts, defaults to the number of cores.
+    repeats (int): Timed calls per configuration.
+    model_name (str): The model to benchmark.
+    dtype (str): The inference precision.
+    corpus_path (str): The fixture corpus to build inputs from.
+
+    Returns:
+    dict: The environment, model load cost and one result per configuration.
+    """
+    import torch
+
+    loaded = registry.get(model_name, dtype)
+    corpus = load_corpus(corpus_path)
+    thread_counts = thread_counts or (os.cpu_count() or 1,)
+    inputs = {n: make_inputs(loaded.tokenizer, corpus, n, max(batch_sizes)) for n in input_lengths}
+
+    results = []
+    for threads, length, beams, max_length, batch_size in itertools.product(
+            thread_counts, input_lengths, num_beams, max_lengths, batch_sizes):
+        torch.set_num_threads(threads)
+        case = {'threads': threads, 'input_tokens': length, 'num_beams': beams,
+                'max_length': max_length, 'batch_size': batch_size}
+        case.update(run_case(loaded.tokenizer, inputs[length], batch_size, repeats, max_length=max_length,
+                             min_length=min(30, max_length), num_beams=beams, model_name=model_name,
+                             dtype=dtype, max_input_tokens=max(input_lengths) + 16))
+        case['peak_rss_mb'] = peak_rss_mb()
+        results.append(case)
+        print(json.dumps(case), file=sys.stderr)
+
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'model': model_name,
+            'dtype': dtype,
+            'backend': registry.backend,
+        },
+        'model_load_seconds': loaded.load_seconds,
+        'model_rss_mb': loaded.rss_bytes / 2**20,
+        'results': results,
+    }
+
+
+def assisted_report(texts, draft_model=DRAFT_MODEL, references=None, model_name=DEFAULT_MODEL, dtype='float32',
+                    max_length=150, min_length=30, num_beams=4):
+    """
+    Compares assisted generation with the default beam search and with plain greedy decoding.
+
+    Each text is summarized on its own, with the summary and encoder caches
+    disabled, in three modes: beam search, greedy, and greedy assisted by
+    the draft model. Assisted output should match greedy output, since the
+    full model verifies every drafted token. ROUGE is scored against the references
+    when given, otherwise against the beam search summaries.
+
+    Parameters:
+    texts (list): The fixed sample of texts.
+    draft_model (str): The draft model.
+    references (list): Reference summaries for the texts, or None.
+    model_name (str): The full model.
+    dtype (str): The inference precision.
+    max_length (int): The maximum length of each summary.
+    min_length (int): The minimum length of each summary.
+    num_beams (int): The beam count of the beam search baseline.
+
+    Returns:
+    dict: Mean latency and mean ROUGE F-measures per mode, the assisted speedup
+    over both baselines, and the fraction of assisted summaries identical to greedy ones.
+    """
+    from .evaluation import ROUGE_TYPES, get_scorer
+
+    modes = {
+        'beam': dict(num_beams=num_beams),
+        'greedy': dict(num_beams=1),
+        'assisted': dict(num_beams=1, draft_model=draft_model),
+    }
+    outputs, latencies = {}, {}
+    for mode, options in modes.items():
+        # Load the models and warm up outside the timed calls
+        summarize_batch(texts[:1], max_length=max_length, min_length=min_length, model_name=model_name,
+                        dtype=dtype, cache=None, encoder_cache=None, **options)
+        outputs[mode], latencies[mode] = [], []
+        for text in texts:
+            start = time.perf_counter()
+            outputs[mode].extend(summarize_batch([text], max_length=max_length, min_length=min_length,
+                                                 model_name=model_name, dtype=dtype, cache=None, encoder_cache=None,
+                                                 **options))
+            latencies[mode].append(time.perf_counter() - start)
+
+    scorer = get_scorer()
+    targets = references if references is not None else outputs['beam']
+    report = {}
+    for mode in modes:
+        scores = [scorer.score(target, summary) for target, summary in zip(targets, outputs[mode])]
+        report[mode] = {
+            'mean_latency': sum(latencies[mode]) / len(texts),
+            'p95_latency': percentile(latencies[mode], 95),
+            'rouge': {name: sum(score[name].fmeasure for score in scores) / len(scores) for name in ROUGE_TYPES},
+        }
+    report['speedup_vs_beam'] = report['beam']['mean_latency'] / report['assisted']['mean_latency']
+    report['speedup_vs_greedy'] = report['greedy']['mean_latency'] / report['assisted']['mean_latency']
+    report['greedy_match_rate'] = sum(a == g for a, g in zip(outputs['assisted'], outputs['greedy'])) / len(texts)
+    return report
+
+
+def _case_key(case):
+    return tuple(case[field] for field in ('threads', 'input_tokens', 'num_beams', 'max_length', 'batch_size'))
+
+
+def compare(current, baseline, tolerance=0.10):
+    """
+    Finds configurations that got slower than the baseline.
+
+    Parameters:
+    current (dict): A benchmark report.
+    baseline (dict): An earlier benchmark report.
+    tolerance (float): The allowed relative change before a case counts as a regression.
+
+    Returns:
+    list: One description per regressed metric.
+    """
+    previous = {_case_key(case): case for case in baseline['results']}
+    regressions = []
+    for case in current['results']:
+        old = previous.get(_case_key(case))
+        if old is None:
+            continue
+        for metric in ('p50', 'p95'):
+            if case[metric] > old[metric] * (1 + tolerance):
+                regressions.append(f"{_case_key(case)} {metric}: {old[metric]:.3f}s -> {case[metric]:.3f}s")
+        if case['tokens_per_sec'] < old['tokens_per_sec'] * (1 - tolerance):
+            regressions.append(f"{_case_key(case)} tokens/sec: "
+                               f"{old['tokens_per_sec']:.1f} -> {case['tokens_per_sec']:.1f}")
+    return regressions
+
+
+def _ints(value):
+    return tuple(int(v) for v in value.split(','))
+
+
+def _names(value):
+    return tuple(v.strip() for v in value.split(','))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark summarization latency and throughput.")
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--baseline', help="A saved report to check for regressions against.")
+    parser.add_argument('--tolerance', type=float, default=0.10)
+    parser.add_argument('--input-lengths', type=_ints, default=DEFAULT_INPUT_LENGTHS)
+    parser.add_argument('--num-beams', type=_ints, default=DEFAULT_NUM_BEAMS)
+    parser.add_argument('--max-lengths', type=_ints, default=DEFAULT_MAX_LENGTHS)
+    parser.add_argument('--batch-sizes', type=_ints, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--threads', type=_ints, default=None)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--dtype', default='float32')
+    parser.add_argument('--corpus', default=CORPUS_PATH)
+    parser.add_argument('--draft-model', default=None,
+                        help=f"Also compare assisted generation with this draft model, e.g. {DRAFT_MODEL}.")
+    parser.add_argument('--backend', choices=BACKENDS, default=registry.backend,
+                        help="The inference backend to benchmark.")
+    parser.add_argument('--compare-backends', type=_names, default=None,
+                        help="Also check these backends for parity and compare their latency, e.g. torch,onnx.")
+    args = parser.parse_args(argv)
+    if args.draft_model and args.backend != 'torch':
+        parser.error("--draft-model needs --backend torch")
+
+    registry.backend = args.backend
+
+    report = run_benchmark(args.input_lengths, args.num_beams, args.max_lengths, args.batch_sizes, args.threads,
+                           args.repeats, args.model, args.dtype, args.corpus)
+    if args.draft_model:
+        tokenizer = registry.get(args.model, args.dtype).tokenizer
+        corpus = load_corpus(args.corpus)
+        texts = make_inputs(tokenizer, corpus, max(args.input_lengths), len(corpus))
+        report['assisted'] = assisted_report(texts, args.draft_model, model_name=args.model, dtype=args.dtype)
+        print(json.dumps(report['assisted'], indent=2), file=sys.stderr)
+    if args.compare_backends:
+        tokenizer = registry.get(args.model, args.dtype).tokenizer
+        corpus = load_corpus(args.corpus)
+        texts = make_inputs(tokenizer, corpus, max(args.input_lengths), len(corpus))
+        report['backends'] = compare_backends(texts, args.compare_backends, model_name=args.model, dtype=args.dtype)
+        print(json.dumps(report['backends'], indent=2), file=sys.stderr)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
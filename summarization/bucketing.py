@@ -0,0 +1,126 @@
+"""
+Length-bucketed batching under a token budget.
+
+A batch is padded to its longest input, so mixing short and long texts
+spends most of the encoder's work on padding. Here inputs are sorted by
+tokenized length and cut into batches whose padded size
+(``len(batch) * longest``) stays within a token budget, so short texts
+travel in large batches and long ones in small batches. Callers put the
+results back in the original order using the returned indices.
+"""
+import threading
+
+from .core import MAX_INPUT_TOKENS, PREFIX
+
+# Padded input tokens per generate call; 8 full-length inputs at the 512-token limit
+DEFAULT_TOKEN_BUDGET = 4096
+
+
+def token_lengths(texts, tokenizer, max_tokens=MAX_INPUT_TOKENS):
+    """
+    Returns the tokenized length of each text as ``summarize_batch`` would encode it.
+
+    Parameters:
+    texts (list): The texts to measure.
+    tokenizer: The model's tokenizer.
+    max_tokens (int): Lengths are capped at the truncation limit.
+
+    Returns:
+    list: One token count per text.
+    """
+    encoded = tokenizer([PREFIX + text for text in texts], max_length=max_tokens, truncation=True)
+    return [len(ids) for ids in encoded['input_ids']]
+
+
+def token_budget_batches(lengths, token_budget=DEFAULT_TOKEN_BUDGET, max_batch_size=None):
+    """
+    Groups inputs into length-sorted batches under a padded-token budget.
+
+    Parameters:
+    lengths (list): The token length of each input.
+    token_budget (int): The largest padded size of a batch. An input longer than the budget gets a batch of its own.
+    max_batch_size (int): An optional cap on the number of inputs per batch.
+
+    Returns:
+    list: Batches of indices into lengths, shortest inputs first.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches, current = [], []
+    for i in order:
+        # Sorted order means the newest input is always the longest in its batch
+        if current and ((len(current) + 1) * lengths[i] > token_budget
+                        or (max_batch_size and len(current) >= max_batch_size)):
+            batches.append(current)
+            current = []
+        current.append(i)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def fixed_size_batches(count, batch_size):
+    """
+    Returns arrival-order batches of ``batch_size`` indices, the unbucketed baseline.
+    """
+    return [list(range(start, min(start + batch_size, count))) for start in range(0, count, batch_size)]
+
+
+def padded_tokens(lengths, batches):
+    """
+    Returns the number of tokens the encoder processes for the given batches, padding included.
+    """
+    return sum(len(batch) * max(lengths[i] for i in batch) for batch in batches if batch)
+
+
+class PaddingStats:
+    """
+    Accumulates padding with and without bucketing.
+
+    Attributes:
+    tokens (int): Real input tokens.
+    padded_before (int): Padded tokens the unbucketed batches would have processed.
+    padded_after (int): Padded tokens the bucketed batches processed.
+    """
+
+    def __init__(self):
+        self.tokens = 0
+        self.padded_before = 0
+        self.padded_after = 0
+        self._lock = threading.Lock()
+
+    def record(self, lengths, batches, baseline_batches):
+        """
+        Records one group of inputs.
+
+        Parameters:
+        lengths (list): The token length of each input.
+        batches (list): The batches the inputs were run in.
+        baseline_batches (list): The batches they would have been run in without bucketing.
+        """
+        with self._lock:
+            self.tokens += sum(lengths)
+            self.padded_before += padded_tokens(lengths, baseline_batches)
+            self.padded_after += padded_tokens(lengths, batches)
+
+    @staticmethod
+    def _ratio(padded, tokens):
+        return (padded - tokens) / padded if padded else 0.0
+
+    @property
+    def padding_ratio_before(self):
+        """The fraction of encoder tokens that would have been padding without bucketing."""
+        return self._ratio(self.padded_before, self.tokens)
+
+    @property
+    def padding_ratio_after(self):
+        """The fraction of encoder tokens that were padding."""
+        return self._ratio(self.padded_after, self.tokens)
+
+    def as_dict(self):
+        return {
+            'tokens': self.tokens,
+            'padded_before': self.padded_before,
+            'padded_after': self.padded_after,
+            'padding_ratio_before': self.padding_ratio_before,
+            'padding_ratio_after': self.padding_ratio_after,
+        }
@@ -0,0 +1,285 @@
+"""
+Content-addressed caches of generated summaries and encoder outputs.
+
+Summaries are keyed by a hash of the normalized input text and every
+generation parameter that affects the output, so a repeated request for
+the same text and settings skips generation entirely. The cache has a
+bounded in-memory LRU tier and an optional SQLite tier that survives
+restarts.
+
+Encoder hidden states are keyed by a hash of the input tokens alone, so
+re-summarizing a text with different decoding parameters skips the
+encoder pass. That cache is bounded by the memory its tensors take.
+"""
+import collections
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """
+    Normalizes text so trivially different copies share a cache entry.
+
+    Parameters:
+    text (str): The input text.
+
+    Returns:
+    str: The NFC-normalized text with runs of whitespace collapsed.
+    """
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def cache_key(text, **params):
+    """
+    Returns the cache key for a text and its generation parameters.
+
+    Parameters:
+    text (str): The input text.
+    **params: The generation parameters, e.g. max_length, num_beams and model_name.
+
+    Returns:
+    str: A hex SHA-256 digest.
+    """
+    payload = json.dumps([normalize_text(text), params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """
+    An LRU cache of summaries with an optional SQLite tier.
+
+    Parameters:
+    max_entries (int): The capacity of the in-memory tier.
+    path (str): The SQLite database file of the persistent tier, or None for memory only.
+    """
+
+    def __init__(self, max_entries=1024, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL)')
+            self._db.commit()
+
+    def get(self, key):
+        """
+        Returns the cached summary for a key, or None on a miss.
+        """
+        with self._lock:
+            summary = self._entries.get(key)
+            if summary is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return summary
+            if self._db is not None:
+                row = self._db.execute('SELECT summary FROM summaries WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    self.disk_hits += 1
+                    self._insert(key, row[0])
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, summary):
+        """
+        Stores a summary in both tiers.
+        """
+        with self._lock:
+            self._insert(key, summary)
+            if self._db is not None:
+                self._db.execute('INSERT OR REPLACE INTO summaries (key, summary) VALUES (?, ?)', (key, summary))
+                self._db.commit()
+
+    def _insert(self, key, summary):
+        self._entries[key] = summary
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Empties both tiers. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM summaries')
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+        dict: Hits (memory and disk), misses, evictions, size and hit rate.
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+def encoder_key(model_key, token_ids):
+    """
+    Returns the encoder cache key for one input.
+
+    Parameters:
+    model_key (tuple): The registry key of the model, see ``LoadedModel.key``.
+    token_ids (list): The input ids, without padding.
+
+    Returns:
+    str: A hex SHA-256 digest.
+    """
+    payload = json.dumps([list(model_key), token_ids])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EncoderCache:
+    """
+    An LRU cache of encoder hidden states bounded by their size in memory.
+
+    Each entry holds the hidden states of one input without its padding,
+    so inputs can be served from the cache whatever batch they arrive in.
+
+    Parameters:
+    max_bytes (int): The total size of the cached tensors. The least recently
+    used entries are evicted beyond it, and larger entries are not cached at all.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached hidden states for a key, or None on a miss.
+        """
+        with self._lock:
+            hidden = self._entries.get(key)
+            if hidden is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return hidden
+
+    def put(self, key, hidden):
+        """
+        Stores the hidden states of one input, evicting old entries to stay within max_bytes.
+        """
+        size = hidden.element_size() * hidden.nelement()
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous.element_size() * previous.nelement()
+            self._entries[key] = hidden
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.element_size() * evicted.nelement()
+                self.evictions += 1
+
+    def encode(self, loaded, input_ids, attention_mask):
+        """
+        Runs the encoder on the inputs that are not cached yet.
+
+        Inputs must be right-padded, as the BART tokenizer does by default.
+
+        Parameters:
+        loaded (LoadedModel): The model whose encoder to run.
+        input_ids (torch.Tensor): The padded input ids.
+        attention_mask (torch.Tensor): The attention mask of the inputs.
+
+        Returns:
+        BaseModelOutput: The encoder outputs for the whole batch.
+        """
+        from transformers.modeling_outputs import BaseModelOutput
+
+        lengths = attention_mask.sum(dim=1).tolist()
+        keys = [encoder_key(loaded.key, input_ids[row, :length].tolist()) for row, length in enumerate(lengths)]
+        states = [self.get(key) for key in keys]
+        missing = [row for row, hidden in enumerate(states) if hidden is None]
+        if len(missing) == len(states):
+            outputs = loaded.backend.encode(input_ids, attention_mask)
+            for row, length in enumerate(lengths):
+                # Copy, so a cached entry does not keep the whole batch alive
+                self.put(keys[row], outputs.last_hidden_state[row, :length].clone())
+            return outputs
+
+        if missing:
+            longest = max(lengths[row] for row in missing)
+            outputs = loaded.backend.encode(input_ids[missing, :longest], attention_mask[missing, :longest])
+            for i, row in enumerate(missing):
+                states[row] = outputs.last_hidden_state[i, :lengths[row]].clone()
+                self.put(keys[row], states[row])
+        hidden = states[0].new_zeros((len(states), input_ids.shape[1], states[0].shape[-1]))
+        for row, length in enumerate(lengths):
+            hidden[row, :length] = states[row]
+        return BaseModelOutput(last_hidden_state=hidden)
+
+    def clear(self):
+        """
+        Empties the cache. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+        dict: Hits, misses, evictions, size, memory used and hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'bytes': self.bytes,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+# The caches used by summarize() and summarize_batch() unless told otherwise
+summary_cache = SummaryCache()
+encoder_cache = EncoderCache()
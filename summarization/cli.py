@@ -0,0 +1,225 @@
+"""
+Bulk summarization of document files.
+
+Documents are streamed from JSONL, CSV or plain-text files (or stdin)
+through a generator pipeline into batched ``summarize_batch`` calls, and
+each batch of results is appended to a JSONL output file as soon as it is
+ready. Only one batch is held in memory at a time.
+
+With ``--dedup``, near-duplicate documents (see ``summarization.dedup``)
+are summarized once and the summary is written for every copy.
+
+Input formats:
+- jsonl: one object per line with an id field and a text field.
+- csv: a header row naming the id and text columns.
+- txt: one document per line; the line number is the id.
+
+Usage:
+python -m summarization.cli documents.jsonl -o summaries.jsonl
+python -m summarization.cli documents.jsonl -o summaries.jsonl --resume
+cat documents.txt | python -m summarization.cli - --format txt -o summaries.jsonl
+python -m summarization.cli feed.jsonl -o summaries.jsonl --dedup --dedup-threshold 0.8
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+from .core import summarize_batch
+from .dedup import DEFAULT_THRESHOLD, NearDuplicateIndex, drop_repeated_sentences
+from .registry import DEFAULT_MODEL
+
+# Bytes read at a time when looking for the end of the last complete output line
+TAIL_CHUNK_BYTES = 2**16
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return {'jsonl': 'jsonl', 'ndjson': 'jsonl', 'csv': 'csv'}.get(extension, 'txt')
+
+
+def read_documents(lines, fmt, id_field='id', text_field='text'):
+    """
+    Yields (id, text) pairs from an iterable of input lines.
+
+    Parameters:
+    lines: An open text file or any iterable of lines.
+    fmt (str): One of jsonl, csv or txt.
+    id_field (str): The id field or column. Missing ids fall back to the record number.
+    text_field (str): The text field or column.
+    """
+    if fmt == 'jsonl':
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                record = json.loads(line)
+                yield str(record.get(id_field, number)), record[text_field]
+    elif fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(lines), 1):
+            yield str(row.get(id_field) or number), row[text_field]
+    elif fmt == 'txt':
+        for number, line in enumerate(lines, 1):
+            if line.strip():
+                yield str(number), line.strip()
+    else:
+        raise ValueError(f"Unknown input format {fmt!r}")
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def completed_ids(path):
+    """
+    Returns the ids already present in an output file.
+
+    A crash mid-write can leave a truncated last line. It is cut off here,
+    so the document is redone and appended results start on a fresh line.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'rb+') as f:
+        # Search backwards from the end for the last newline, so only the tail is read
+        end = position = f.seek(0, os.SEEK_END)
+        while position > 0:
+            start = max(0, position - TAIL_CHUNK_BYTES)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b'\n')
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+    ids = set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                ids.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                continue
+    return ids
+
+
+def summarize_stream(documents, batch_size=8, dedup=None, **generation):
+    """
+    Summarizes (id, text) pairs lazily, one batch at a time.
+
+    Parameters:
+    documents: An iterable of (id, text) pairs.
+    batch_size (int): Documents per generate call.
+    dedup (NearDuplicateIndex): Summarize only the first document of each group of near-duplicates and
+        reuse its summary for the rest, or None to summarize every document. The summary of every group
+        is kept in memory.
+    **generation: Generation parameters passed on to ``summarize_batch``.
+
+    Yields:
+    list: One list of (id, summary) pairs per batch.
+    """
+    if dedup is None:
+        for batch in batched(documents, batch_size):
+            summaries = summarize_batch([text for _, text in batch], **generation)
+            yield [(doc_id, summary) for (doc_id, _), summary in zip(batch, summaries)]
+        return
+
+    group_summaries = {}
+    for batch in batched(documents, batch_size):
+        groups = [dedup.add(text) for _, text in batch]
+        new = {group: text for (_, text), (group, is_new) in zip(batch, groups) if is_new}
+        if new:
+            group_summaries.update(zip(new, summarize_batch(list(new.values()), **generation)))
+        yield [(doc_id, group_summaries[group]) for (doc_id, _), (group, _) in zip(batch, groups)]
+
+
+def run(input_path, output_path, fmt=None, resume=False, batch_size=8, id_field='id', text_field='text',
+        dedup_threshold=None, dedup_sentences=False, progress=sys.stderr, **generation):
+    """
+    Summarizes every document of an input file into a JSONL output file.
+
+    Parameters:
+    input_path (str): The input file, or '-' for stdin.
+    output_path (str): The JSONL file results are appended to.
+    fmt (str): The input format, detected from the file extension when None.
+    resume (bool): Skip documents whose id is already in the output file.
+    batch_size (int): Documents per generate call.
+    id_field (str): The id field or column of the input.
+    text_field (str): The text field or column of the input.
+    dedup_threshold (float): Summarize groups of near-duplicate documents once, grouping documents whose
+        estimated shingle Jaccard similarity reaches this threshold, or None to summarize every document.
+    dedup_sentences (bool): Remove sentences repeated within a document before summarizing it.
+    progress: A stream progress lines are written to, or None.
+    **generation: Generation parameters passed on to ``summarize_batch``.
+
+    Returns:
+    int: The number of documents summarized.
+    """
+    fmt = fmt or ('txt' if input_path == '-' else detect_format(input_path))
+    done = completed_ids(output_path) if resume else set()
+
+    source = sys.stdin if input_path == '-' else open(input_path, encoding='utf-8', newline='')
+    try:
+        documents = read_documents(source, fmt, id_field, text_field)
+        if done:
+            documents = ((doc_id, text) for doc_id, text in documents if doc_id not in done)
+        if dedup_sentences:
+            documents = ((doc_id, drop_repeated_sentences(text)) for doc_id, text in documents)
+        dedup = NearDuplicateIndex(dedup_threshold) if dedup_threshold else None
+        count, started = 0, time.perf_counter()
+        with open(output_path, 'a' if resume else 'w', encoding='utf-8') as out:
+            for results in summarize_stream(documents, batch_size, dedup, **generation):
+                for doc_id, summary in results:
+                    out.write(json.dumps({'id': doc_id, 'summary': summary}, ensure_ascii=False) + '\n')
+                out.flush()
+                count += len(results)
+                if progress is not None:
+                    elapsed = time.perf_counter() - started
+                    print(f"\r{count} documents, {count / elapsed:.2f} docs/s", end='', file=progress, flush=True)
+        if progress is not None:
+            skipped = f", {len(done)} already done" if done else ''
+            print(f"\rSummarized {count} documents in {time.perf_counter() - started:.1f}s{skipped}",
+                  file=progress)
+            if dedup is not None:
+                stats = dedup.stats
+                print(f"Generated {stats.groups} summaries for {stats.documents} documents: {stats.duplicates} "
+                      f"near-duplicates ({stats.saved_fraction:.1%}, {stats.saved_words} input words) reused "
+                      f"their group's summary", file=progress)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize documents from a file into JSONL.")
+    parser.add_argument('input', help="JSONL, CSV or text file, or '-' for stdin.")
+    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--format', choices=['jsonl', 'csv', 'txt'], default=None)
+    parser.add_argument('--resume', action='store_true', help="Skip ids already in the output file.")
+    parser.add_argument('--id-field', default='id')
+    parser.add_argument('--text-field', default='text')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-length', type=int, default=150)
+    parser.add_argument('--min-length', type=int, default=30)
+    parser.add_argument('--num-beams', type=int, default=4)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--dedup', action='store_true', help="Summarize near-duplicate documents once.")
+    parser.add_argument('--dedup-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="The estimated shingle Jaccard similarity at which documents are near-duplicates.")
+    parser.add_argument('--dedup-sentences', action='store_true',
+                        help="Remove sentences repeated within a document before summarizing it.")
+    args = parser.parse_args(argv)
+
+    run(args.input, args.output, args.format, args.resume, args.batch_size, args.id_field, args.text_field,
+        args.dedup_threshold if args.dedup else None, args.dedup_sentences,
+        max_length=args.max_length, min_length=args.min_length, num_beams=args.num_beams, model_name=args.model)
+
+
+if __name__ == '__main__':
+    main()
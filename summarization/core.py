@@ -0,0 +1,277 @@
+"""
+Summarization with the BART model.
+"""
+import time
+
+from . import metrics
+from .cache import cache_key, encoder_cache, summary_cache
+from .executor import run_inference
+from .registry import DEFAULT_DEVICE, DEFAULT_DTYPE, DEFAULT_MODEL, registry
+
+# BART was fine-tuned with inputs truncated to this many tokens
+MAX_INPUT_TOKENS = 512
+PREFIX = "summarize: "
+# A distilled BART sharing bart-large-cnn's vocabulary, suitable as a draft model for assisted generation
+DRAFT_MODEL = 'sshleifer/distilbart-cnn-12-6'
+
+
+def summarize(text, max_length=150, min_length=30, num_beams=4,
+              model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE, long_input=False,
+              cache=summary_cache, draft_model=None, extractive=False, encoder_cache=encoder_cache):
+    """
+    Summarizes the given text using the BART model.
+
+    The model is loaded on the first call and shared by every later call
+    in the process, see ``summarization.registry``.
+
+    Parameters:
+    text (str): The text to be summarized.
+    max_length (int): The maximum length of the summary.
+    min_length (int): The minimum length of the summary.
+    num_beams (int): The number of beams for beam search. More beams result in better performance but are slower.
+    model_name (str): The model to summarize with.
+    dtype (str): The inference precision: float32, int8 or bfloat16.
+    device (str): The device the model runs on.
+    long_input (bool): Summarize the whole text with chunked map-reduce
+        (see ``summarization.longdoc``) instead of truncating it to
+        ``MAX_INPUT_TOKENS`` tokens.
+    cache (SummaryCache): The cache to look the summary up in, or None to always generate.
+    draft_model (str): A smaller model with the same vocabulary, e.g. a distilled BART, used for
+        assisted generation: it proposes tokens that the full model verifies. Assisted generation
+        decodes greedily, so num_beams is ignored, and needs the torch backend. None uses plain beam search.
+    extractive (bool): Shrink the text to its most salient sentences first
+        (see ``summarization.extractive``) instead of truncating it.
+    encoder_cache (EncoderCache): The cache of encoder outputs, so re-summarizing the text with
+        other decoding parameters skips the encoder. None always runs the encoder.
+
+    Returns:
+    str: The generated summary.
+    """
+    if not long_input:
+        return summarize_batch([text], max_length=max_length, min_length=min_length, num_beams=num_beams,
+                               model_name=model_name, dtype=dtype, device=device, cache=cache,
+                               draft_model=draft_model, extractive=extractive, encoder_cache=encoder_cache)[0]
+
+    from .longdoc import summarize_long
+    key = cache_key(text, max_length=max_length, min_length=min_length, num_beams=num_beams,
+                    model_name=model_name, dtype=dtype, backend=registry.backend, long_input=True)
+    summary = cache.get(key) if cache is not None else None
+    if summary is None:
+        summary = summarize_long(text, max_length=max_length, min_length=min_length, num_beams=num_beams,
+                                 model_name=model_name, dtype=dtype, device=device)
+        if cache is not None:
+            cache.put(key, summary)
+    return summary
+
+
+def summarize_batch(texts, max_length=150, min_length=30, num_beams=4,
+                    model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE,
+                    max_input_tokens=MAX_INPUT_TOKENS, cache=summary_cache, draft_model=None, extractive=False,
+                    encoder_cache=encoder_cache):
+    """
+    Summarizes several texts with a single call to ``model.generate``.
+
+    Inputs are padded to the longest text in the batch, so the batch is
+    cheapest when the texts have similar lengths.
+
+    Parameters:
+    texts (list): The texts to be summarized.
+    max_length (int): The maximum length of each summary.
+    min_length (int): The minimum length of each summary.
+    num_beams (int): The number of beams for beam search.
+    model_name (str): The model to summarize with.
+    dtype (str): The inference precision: float32, int8 or bfloat16.
+    device (str): The device the model runs on.
+    max_input_tokens (int): Inputs are truncated to this many tokens.
+    cache (SummaryCache): The cache to look summaries up in, or None to always generate.
+    draft_model (str): A draft model for assisted generation, see ``summarize``.
+    extractive (bool): Shrink each text to its most salient sentences first, see ``summarize``.
+    encoder_cache (EncoderCache): The cache of encoder outputs, see ``summarize``.
+
+    Returns:
+    list: The generated summaries, in the same order as ``texts``.
+    """
+    if extractive:
+        texts = _preselect(texts, model_name, dtype, device, max_input_tokens)
+    if cache is None:
+        return _generate(texts, max_length, min_length, num_beams, model_name, dtype, device, max_input_tokens,
+                         draft_model, encoder_cache)
+
+    keys = [cache_key(text, max_length=max_length, min_length=min_length, num_beams=num_beams,
+                      model_name=model_name, dtype=dtype, backend=registry.backend,
+                      max_input_tokens=max_input_tokens, draft_model=draft_model)
+            for text in texts]
+    summaries = [cache.get(key) for key in keys]
+    # Texts repeated within the batch are generated once
+    missing = {}
+    for i, summary in enumerate(summaries):
+        if summary is None:
+            missing.setdefault(keys[i], []).append(i)
+    if missing:
+        generated = _generate([texts[indices[0]] for indices in missing.values()], max_length, min_length,
+                              num_beams, model_name, dtype, device, max_input_tokens, draft_model, encoder_cache)
+        for (key, indices), summary in zip(missing.items(), generated):
+            cache.put(key, summary)
+            for i in indices:
+                summaries[i] = summary
+    return summaries
+
+
+def summarize_token_ids(token_ids, max_length=150, min_length=30, num_beams=4,
+                        model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE,
+                        encoder_cache=encoder_cache):
+    """
+    Summarizes inputs that have already been tokenized.
+
+    This skips tokenization entirely, e.g. for ids read from a
+    ``summarization.tokcache.TokenCache``. The summary cache is not
+    consulted since it is keyed by text.
+
+    Parameters:
+    token_ids (list): One sequence of input ids per text, including the prefix and special tokens.
+    max_length (int): The maximum length of each summary.
+    min_length (int): The minimum length of each summary.
+    num_beams (int): The number of beams for beam search.
+    model_name (str): The model to summarize with.
+    dtype (str): The inference precision: float32, int8 or bfloat16.
+    device (str): The device the model runs on.
+    encoder_cache (EncoderCache): The cache of encoder outputs, see ``summarize``.
+
+    Returns:
+    list: The generated summaries, in the same order as ``token_ids``.
+    """
+    if not len(token_ids):
+        return []
+    import numpy as np
+    import torch
+
+    loaded = registry.get(model_name, dtype, device)
+    watch = _Stopwatch(len(token_ids), num_beams)
+    longest = max(len(ids) for ids in token_ids)
+    input_ids = torch.full((len(token_ids), longest), loaded.tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(token_ids), longest), dtype=torch.long)
+    for row, ids in enumerate(token_ids):
+        # Copy first: rows of a TokenCache are read-only memmap views, which torch warns about
+        input_ids[row, :len(ids)] = torch.from_numpy(np.array(ids, dtype=np.int64))
+        attention_mask[row, :len(ids)] = 1
+    watch.lap('tokenize')
+    return run_inference(_generate_from_ids, loaded, input_ids, attention_mask, watch, max_length, min_length,
+                         num_beams, device, encoder_cache)
+
+
+def _preselect(texts, model_name, dtype, device, max_input_tokens):
+    from .extractive import preselect
+
+    tokenizer = registry.get(model_name, dtype, device).tokenizer
+    # Leave room for the prefix and the special tokens
+    budget = max_input_tokens - len(tokenizer.encode(PREFIX, add_special_tokens=False)) - 2
+    return [preselect(text, budget, tokenizer) for text in texts]
+
+
+class _Stopwatch:
+    """
+    Times consecutive stages into a StageRecord while metrics hooks are registered.
+    """
+
+    def __init__(self, batch_size, num_beams):
+        self.record = metrics.StageRecord(batch_size, num_beams) if metrics.enabled() else None
+        self.clock = time.perf_counter()
+
+    def lap(self, stage):
+        if self.record is not None:
+            now = time.perf_counter()
+            self.record.seconds[stage] += now - self.clock
+            self.clock = now
+
+    def skip(self):
+        """
+        Starts the next stage now, leaving the time since the last lap out of every stage.
+        """
+        self.clock = time.perf_counter()
+
+
+def _generate(texts, max_length, min_length, num_beams, model_name, dtype, device, max_input_tokens,
+              draft_model=None, encoder_cache=None):
+    if not texts:
+        return []
+    if draft_model is not None and registry.backend != 'torch':
+        # ORT decoders return their past key values as tuples, which assisted decoding cannot crop
+        raise ValueError(f"Assisted generation with draft_model needs the torch backend, not {registry.backend}")
+    loaded = registry.get(model_name, dtype, device)
+    watch = _Stopwatch(len(texts), num_beams)
+
+    # Tokenize the input texts, padding them to a common length
+    inputs = loaded.tokenizer([PREFIX + text for text in texts], return_tensors='pt', padding=True,
+                              max_length=max_input_tokens, truncation=True)
+    watch.lap('tokenize')
+    if draft_model is not None:
+        draft = registry.get(draft_model, dtype, device).model
+        return run_inference(_generate_assisted, loaded, draft, inputs['input_ids'], inputs['attention_mask'], watch,
+                             max_length, min_length, device)
+    # Queued to the inference executor if one is installed, see summarization.executor
+    return run_inference(_generate_from_ids, loaded, inputs['input_ids'], inputs['attention_mask'], watch,
+                         max_length, min_length, num_beams, device, encoder_cache)
+
+
+def _generate_assisted(loaded, draft, input_ids, attention_mask, watch, max_length, min_length, device):
+    # Time queued for the executor is reported by the executor, not as a stage
+    watch.skip()
+    from transformers import LogitsProcessorList, MinNewTokensLengthLogitsProcessor
+
+    tokenizer, model = loaded.tokenizer, loaded.model
+    input_ids, attention_mask = input_ids.to(device), attention_mask.to(device)
+    # Assisted decoding rejects min_length, and turns min_new_tokens back into it, so the minimum is
+    # enforced by a processor of its own. The decoder starts from one token, which min_length counts.
+    min_tokens = LogitsProcessorList([MinNewTokensLengthLogitsProcessor(1, max(min_length - 1, 0),
+                                                                        model.config.eos_token_id)])
+
+    # Assisted generation verifies one greedy hypothesis at a time, so rows are generated separately.
+    # The encoder runs inside generate here, because the draft model needs the raw input ids too.
+    rows = []
+    for row in range(input_ids.shape[0]):
+        length = int(attention_mask[row].sum())
+        row_ids, row_mask = input_ids[row:row + 1, :length], attention_mask[row:row + 1, :length]
+        rows.append(model.generate(row_ids, attention_mask=row_mask, assistant_model=draft,
+                                   max_length=max_length, min_length=0, logits_processor=min_tokens, num_beams=1,
+                                   do_sample=False)[0])
+    watch.lap('decode')
+
+    summaries = [tokenizer.decode(ids, skip_special_tokens=True) for ids in rows]
+    watch.lap('detokenize')
+
+    if watch.record is not None:
+        watch.record.num_beams = 1
+        watch.record.input_tokens = int(attention_mask.sum())
+        watch.record.output_tokens = sum(int((ids != model.config.pad_token_id).sum()) for ids in rows)
+        metrics.emit(watch.record)
+    return summaries
+
+
+def _generate_from_ids(loaded, input_ids, attention_mask, watch, max_length, min_length, num_beams, device,
+                       encoder_cache=None):
+    watch.skip()
+    tokenizer, backend = loaded.tokenizer, loaded.backend
+    input_ids, attention_mask = input_ids.to(device), attention_mask.to(device)
+
+    # Run the encoder on its own so it can be timed separately from the decoder loop,
+    # and skipped for inputs whose hidden states are cached
+    if encoder_cache is not None:
+        encoder_outputs = encoder_cache.encode(loaded, input_ids, attention_mask)
+    else:
+        encoder_outputs = backend.encode(input_ids, attention_mask)
+    watch.lap('encode')
+
+    # Generate the summaries
+    summary_ids = backend.generate(encoder_outputs, attention_mask, max_length=max_length, min_length=min_length,
+                                   num_beams=num_beams, length_penalty=2.0, early_stopping=True)
+    watch.lap('decode')
+
+    # Decode the summaries
+    summaries = tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+    watch.lap('detokenize')
+
+    if watch.record is not None:
+        watch.record.input_tokens = int(attention_mask.sum())
+        watch.record.output_tokens = int((summary_ids != backend.config.pad_token_id).sum())
+        metrics.emit(watch.record)
+    return summaries
@@ -0,0 +1,262 @@
+"""
+Near-duplicate detection for bulk inputs.
+
+News feeds and syndicated articles carry many copies of the same story
+that differ only in a byline, a dateline or an appended paragraph, and
+each copy pays for a full generate call. The summary cache only catches
+exact copies. ``NearDuplicateIndex`` fingerprints each document with a
+MinHash signature over word shingles, finds earlier documents with a
+similar signature through locality-sensitive hashing, and puts a
+document in the group of the first one whose estimated Jaccard
+similarity reaches the threshold. Each group is summarized once, from its
+first document, and the summary is fanned out to every member.
+
+``drop_repeated_sentences`` handles the sentence-level case: sentences
+repeated inside a document, e.g. a pasted lead paragraph, are removed
+before the document is encoded.
+"""
+import hashlib
+import re
+
+from .cache import normalize_text
+from .longdoc import split_sentences
+
+_WORD = re.compile(r'\w+')
+
+# Mersenne prime modulus of the MinHash permutations, as in datasketch
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+DEFAULT_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """
+    Returns the set of word n-grams of a text.
+
+    Parameters:
+    text (str): The text.
+    size (int): Words per shingle. Texts shorter than that give a single shingle.
+
+    Returns:
+    set: The shingles, as space-joined lowercase words.
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM):
+    """
+    Chooses how to split a signature into bands for a similarity threshold.
+
+    Two documents become candidates when all rows of any band match, which
+    happens with probability ``1 - (1 - s**rows)**bands`` for similarity s.
+    The split is the one whose S-curve midpoint ``(1 / bands)**(1 / rows)``
+    is the highest that still lies below the threshold, so few true
+    duplicates are missed and few dissimilar pairs need checking.
+
+    Returns:
+    tuple: (bands, rows) with bands * rows == num_perm.
+    """
+    splits = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [(bands, rows) for bands, rows in splits if (1 / bands) ** (1 / rows) < threshold]
+    return max(below, key=lambda split: (1 / split[0]) ** (1 / split[1])) if below else splits[0]
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures, whose agreement estimates Jaccard similarity.
+
+    Parameters:
+    num_perm (int): The signature length. The estimate's standard error is about 1 / sqrt(num_perm).
+    seed (int): Seeds the permutations; signatures are only comparable under the same seed.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        import numpy as np
+
+        generator = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = generator.randint(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, features):
+        """
+        Returns the MinHash signature of a set of strings.
+
+        Returns:
+        numpy.ndarray: num_perm uint64 values.
+        """
+        import numpy as np
+
+        digests = [hashlib.blake2b(feature.encode('utf-8'), digest_size=4).digest() for feature in features]
+        hashes = np.array([int.from_bytes(digest, 'little') for digest in digests] or [0], dtype=np.uint64)
+        # Wrapping uint64 arithmetic is fine here, the values only need to be well mixed
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(_PRIME) & np.uint64(_MAX_HASH)
+        return permuted.min(axis=0)
+
+    @staticmethod
+    def similarity(first, second):
+        """
+        Returns the estimated Jaccard similarity of two signatures.
+        """
+        return float((first == second).mean())
+
+
+class DedupStats:
+    """
+    How much generation near-duplicate grouping saved.
+
+    Attributes:
+    documents (int): Documents seen.
+    groups (int): Distinct groups, i.e. documents that were summarized.
+    duplicates (int): Documents that reused their group's summary.
+    saved_words (int): Input words of the duplicates, which were never encoded.
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.groups = 0
+        self.duplicates = 0
+        self.saved_words = 0
+
+    @property
+    def saved_fraction(self):
+        return self.duplicates / self.documents if self.documents else 0.0
+
+    def as_dict(self):
+        return {
+            'documents': self.documents,
+            'groups': self.groups,
+            'duplicates': self.duplicates,
+            'saved_fraction': self.saved_fraction,
+            'saved_words': self.saved_words,
+        }
+
+
+class NearDuplicateIndex:
+    """
+    Groups documents with their earlier near-duplicates as they arrive.
+
+    A document joins the group of the first earlier group representative
+    whose estimated Jaccard similarity reaches the threshold, or starts a
+    new group. Comparing against representatives only keeps a chain of
+    small edits from drifting into one group of unrelated documents.
+
+    Parameters:
+    threshold (float): The estimated shingle Jaccard similarity at which two documents are duplicates.
+    shingle_size (int): Words per shingle.
+    num_perm (int): The MinHash signature length.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, shingle_size=SHINGLE_SIZE, num_perm=NUM_PERM):
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}")
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        self.stats = DedupStats()
+        self._signatures = []
+        self._buckets = {}
+
+    def add(self, text):
+        """
+        Assigns a document to a group.
+
+        Parameters:
+        text (str): The document.
+
+        Returns:
+        tuple: (group, is_new), where group numbers groups in order of their first document.
+        """
+        signature = self.hasher.signature(shingles(normalize_text(text), self.shingle_size))
+        keys = [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        candidates = sorted({group for key in keys for group in self._buckets.get(key, ())})
+        self.stats.documents += 1
+        for group in candidates:
+            if self.hasher.similarity(signature, self._signatures[group]) >= self.threshold:
+                self.stats.duplicates += 1
+                self.stats.saved_words += len(text.split())
+                return group, False
+
+        group = len(self._signatures)
+        self._signatures.append(signature)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(group)
+        self.stats.groups += 1
+        return group, True
+
+    def __len__(self):
+        return len(self._signatures)
+
+
+def group_near_duplicates(texts, threshold=DEFAULT_THRESHOLD, **options):
+    """
+    Groups near-duplicate texts.
+
+    Parameters:
+    texts (list): The texts.
+    threshold (float): The estimated Jaccard similarity at which two texts are duplicates.
+    **options: shingle_size and num_perm, passed on to ``NearDuplicateIndex``.
+
+    Returns:
+    list: One group per distinct text, each a list of indices into texts whose first index is the representative.
+    """
+    index = NearDuplicateIndex(threshold, **options)
+    groups = []
+    for position, text in enumerate(texts):
+        group, is_new = index.add(text)
+        if is_new:
+            groups.append([])
+        groups[group].append(position)
+    return groups
+
+
+def summarize_deduplicated(texts, threshold=DEFAULT_THRESHOLD, **generation):
+    """
+    Summarizes texts, generating once per group of near-duplicates.
+
+    Parameters:
+    texts (list): The texts to summarize.
+    threshold (float): The estimated Jaccard similarity at which two texts are duplicates.
+    **generation: Generation parameters passed on to ``summarize_batch``.
+
+    Returns:
+    tuple: The summaries, one per text, and the DedupStats of the grouping.
+    """
+    from .core import summarize_batch
+
+    index = NearDuplicateIndex(threshold)
+    groups = [index.add(text)[0] for text in texts]
+    representatives = {}
+    for position, group in enumerate(groups):
+        representatives.setdefault(group, position)
+    summaries = summarize_batch([texts[position] for position in representatives.values()], **generation)
+    return [summaries[group] for group in groups], index.stats
+
+
+def drop_repeated_sentences(text):
+    """
+    Removes sentences that already occurred earlier in the same text.
+
+    Sentences are compared after whitespace normalization and lowercasing.
+
+    Parameters:
+    text (str): The text.
+
+    Returns:
+    str: The remaining sentences, joined by single spaces, or the text unchanged if nothing repeats.
+    """
+    sentences = split_sentences(text)
+    seen, kept = set(), []
+    for sentence in sentences:
+        key = normalize_text(sentence).lower()
+        if key not in seen:
+            seen.add(key)
+            kept.append(sentence)
+    return text if len(kept) == len(sentences) else ' '.join(kept)
@@ -0,0 +1,148 @@
+"""
+ROUGE evaluation of generated summaries against reference summaries.
+"""
+from .bucketing import DEFAULT_TOKEN_BUDGET, fixed_size_batches, token_budget_batches, token_lengths
+from .core import summarize_batch, summarize_token_ids
+from .registry import DEFAULT_DEVICE, DEFAULT_DTYPE, DEFAULT_MODEL, registry
+from .rouge import FastRougeScorer
+
+ROUGE_TYPES = ['rouge1', 'rouge2', 'rougeL']
+
+_scorer = None
+
+
+def get_scorer():
+    """
+    Returns the ROUGE scorer shared by every evaluation in this process.
+
+    Returns:
+    FastRougeScorer: A stemming scorer for rouge1, rouge2 and rougeL, with the same scores as rouge_score.
+    """
+    global _scorer
+    if _scorer is None:
+        _scorer = FastRougeScorer(ROUGE_TYPES, use_stemmer=True)
+    return _scorer
+
+
+def compute_rouge_scores(reference, generated, scorer=None):
+    """
+    Computes ROUGE scores between the reference and generated summaries.
+
+    Parameters:
+    reference (str): The reference summary.
+    generated (str): The generated summary.
+    scorer (FastRougeScorer): The scorer to use, defaults to the shared one.
+
+    Returns:
+    dict: A dictionary containing the ROUGE scores.
+    """
+    return (scorer or get_scorer()).score(reference, generated)
+
+
+def batch_summarize_and_evaluate(dataset, num_samples=10, **options):
+    """
+    Summarizes multiple articles and evaluates using ROUGE scores.
+
+    Parameters:
+    dataset: The dataset containing articles and summaries.
+    num_samples (int): The number of samples to summarize and evaluate.
+    **options: Further options of ``iter_summarize_and_evaluate``.
+
+    Returns:
+    list: A list of dictionaries containing the original text, reference summary, generated summary, and ROUGE scores.
+    """
+    return list(iter_summarize_and_evaluate(dataset, num_samples, **options))
+
+
+def iter_summarize_and_evaluate(dataset, num_samples=10, batch_size=32, slice_size=256, split='test', start=0,
+                                max_length=150, min_length=30, num_beams=4,
+                                model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE,
+                                token_budget=DEFAULT_TOKEN_BUDGET, padding_stats=None, token_cache=None,
+                                rouge_processes=None, aggregator=None, keep_text=True, extractive=False):
+    """
+    Summarizes and evaluates articles, yielding each result as its slice is done.
+
+    The split is read in contiguous slices of ``slice_size`` rows. Within a
+    slice the articles are sorted by token length and grouped into batches
+    of at most ``token_budget`` padded tokens (see ``summarization.bucketing``),
+    then the results are yielded in dataset order. Only one slice is held in
+    memory at a time.
+
+    Parameters:
+    dataset: The dataset containing articles and summaries.
+    num_samples (int): The number of samples to summarize and evaluate.
+    batch_size (int): The largest number of articles per generate call.
+    slice_size (int): The number of rows read from the dataset at a time.
+    split (str): The dataset split to evaluate on.
+    start (int): The index of the first sample.
+    max_length (int): The maximum length of each summary.
+    min_length (int): The minimum length of each summary.
+    num_beams (int): The number of beams for beam search.
+    model_name (str): The model to summarize with.
+    dtype (str): The inference precision: float32, int8 or bfloat16.
+    device (str): The device the model runs on.
+    token_budget (int): The largest padded input size of a generate call, in tokens.
+    padding_stats (PaddingStats): Updated with the padding of every slice, if given.
+    token_cache (TokenCache): Precomputed input ids of the split (see ``summarization.tokcache``).
+        When given, articles are not tokenized again.
+    rouge_processes (int): Worker processes, started once for the whole run, that score each slice,
+        or None to score in this process.
+    aggregator (RougeAggregator): Receives every sample's scores, if given.
+    keep_text (bool): Include the article in each result; turn off to drop it once it has been scored.
+    extractive (bool): Shrink each article to its most salient sentences before summarizing
+        (see ``summarization.extractive``), to compare ROUGE with and without pre-selection.
+
+    Yields:
+    dict: The reference summary, generated summary and ROUGE scores of a sample, plus its article if keep_text is set.
+    """
+    tokenizer = registry.get(model_name, dtype, device).tokenizer
+    if token_cache is not None:
+        token_cache.check(model_name, split)
+        if extractive:
+            raise ValueError("extractive pre-selection needs the article text, it cannot use a token cache")
+    generation = dict(max_length=max_length, min_length=min_length, num_beams=num_beams,
+                      model_name=model_name, dtype=dtype, device=device)
+    scorer = get_scorer()
+    end = min(start + num_samples, len(dataset[split]))
+
+    # Start the scoring workers once; spawning them for every slice costs more than the scoring
+    pool = scorer.pool(rouge_processes) if rouge_processes and rouge_processes > 1 else None
+    try:
+        for slice_start in range(start, end, slice_size):
+            rows = dataset[split][slice_start:min(slice_start + slice_size, end)]
+            articles, highlights = rows['article'], rows['highlights']
+
+            summaries = [None] * len(articles)
+            if token_cache is not None:
+                lengths = token_cache.lengths(slice_start, slice_start + len(articles))
+            else:
+                lengths = token_lengths(articles, tokenizer)
+            batches = token_budget_batches(lengths, token_budget, max_batch_size=batch_size)
+            if padding_stats is not None:
+                padding_stats.record(lengths, batches, fixed_size_batches(len(articles), batch_size))
+            # Every article is encoded once, so caching its encoder outputs would only churn memory
+            for indices in batches:
+                if token_cache is not None:
+                    batch = summarize_token_ids([token_cache[slice_start + i] for i in indices], encoder_cache=None,
+                                                **generation)
+                else:
+                    batch = summarize_batch([articles[i] for i in indices], extractive=extractive, encoder_cache=None,
+                                            **generation)
+                for i, summary in zip(indices, batch):
+                    summaries[i] = summary
+
+            scores = scorer.score_batch(zip(highlights, summaries), pool=pool)
+            for article, reference, summary, rouge_scores in zip(articles, highlights, summaries, scores):
+                if aggregator is not None:
+                    aggregator.add(rouge_scores)
+                result = {
+                    'reference_summary': reference,
+                    'generated_summary': summary,
+                    'rouge_scores': rouge_scores,
+                }
+                if keep_text:
+                    result = {'article': article, **result}
+                yield result
+    finally:
+        if pool is not None:
+            pool.terminate()
@@ -0,0 +1,325 @@
+"""
+A thread pool that owns access to the model.
+
+Streamlit runs every session on its own script thread, and without
+coordination each of them calls ``model.generate`` at once while torch
+sizes its intra-op pool for the whole machine, so the threads fight over
+the cores. ``InferenceExecutor`` runs inference on a fixed number of
+worker threads instead. The cores are split between the workers: each
+one sets its intra-op thread count to its share and, on Linux, pins
+itself to that many cores, so throughput grows with the core count
+instead of collapsing under contention.
+
+Once installed with ``set_executor``, every generate call made by
+``summarize``, ``summarize_batch``, ``stream_summarize`` and the batch
+scheduler is queued to the executor. Callers that are already on one of
+its workers run directly. With no executor installed, inference runs on
+the calling thread as before.
+"""
+import collections
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+
+_STOP = object()
+
+# The executor inference is routed through, see set_executor
+_installed = None
+_default_lock = threading.Lock()
+
+
+class ExecutorStats:
+    """
+    Counters describing the executor's queue.
+
+    Attributes:
+    submitted (int): Tasks submitted.
+    started (int): Tasks picked up by a worker.
+    completed (int): Tasks finished, successfully or not.
+    queue_depth (int): Tasks waiting for a worker right now.
+    max_queue_depth (int): The deepest the queue has been.
+    mean_wait (float): Mean seconds a task waited for a worker.
+    mean_run (float): Mean seconds a task ran.
+    """
+
+    def __init__(self, window=1000):
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+        self._recent_waits = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_submit(self):
+        with self._lock:
+            self.submitted += 1
+            self.queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def record_start(self, wait):
+        with self._lock:
+            self.queue_depth -= 1
+            self.started += 1
+            self._total_wait += wait
+            self._recent_waits.append(wait)
+
+    def record_cancel(self):
+        with self._lock:
+            self.queue_depth -= 1
+
+    def record_done(self, run):
+        with self._lock:
+            self.completed += 1
+            self._total_run += run
+
+    @property
+    def mean_wait(self):
+        return self._total_wait / self.started if self.started else 0.0
+
+    @property
+    def mean_run(self):
+        return self._total_run / self.completed if self.completed else 0.0
+
+    def wait_percentile(self, q):
+        """
+        Returns the q-th percentile (0-100) of recent queue waits, in seconds.
+        """
+        with self._lock:
+            waits = sorted(self._recent_waits)
+        if not waits:
+            return 0.0
+        return waits[min(int(len(waits) * q / 100), len(waits) - 1)]
+
+    def as_dict(self):
+        return {
+            'submitted': self.submitted,
+            'started': self.started,
+            'completed': self.completed,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'mean_wait': self.mean_wait,
+            'p95_wait': self.wait_percentile(95),
+            'mean_run': self.mean_run,
+        }
+
+
+def available_cores():
+    """
+    Returns the cores this process may run on.
+
+    Returns:
+    list: Core ids, in ascending order.
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class InferenceExecutor(Executor):
+    """
+    Runs inference tasks on a fixed pool of configured worker threads.
+
+    Parameters:
+    concurrency (int): Worker threads, i.e. how many generate calls may run at once.
+    intra_op_threads (int): torch intra-op threads per worker, defaults to an even share of the cores.
+    inter_op_threads (int): torch inter-op threads for the process. torch only accepts this
+        before its first parallel operation, so later settings are ignored.
+    pin_cores (bool): Pin each worker to its own share of the cores. Only supported on Linux.
+    """
+
+    def __init__(self, concurrency=1, intra_op_threads=None, inter_op_threads=1, pin_cores=False):
+        cores = available_cores()
+        self.concurrency = concurrency
+        self.intra_op_threads = intra_op_threads or max(len(cores) // concurrency, 1)
+        self.inter_op_threads = inter_op_threads
+        self.pin_cores = pin_cores and hasattr(os, 'sched_setaffinity')
+        # Worker i gets the i-th slice of the cores, wrapping around when there are too few
+        share = self.intra_op_threads
+        self.worker_cores = [[cores[(i * share + j) % len(cores)] for j in range(share)] for i in range(concurrency)]
+        self.stats = ExecutorStats()
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._shutdown = False
+        self._workers = [threading.Thread(target=self._run, args=(i,), name=f'inference-{i}', daemon=True)
+                         for i in range(concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queues a task for the next free worker.
+
+        Returns:
+        Future: Resolves to the task's return value.
+        """
+        if self._shutdown:
+            raise RuntimeError("Cannot submit to an executor that has been shut down")
+        future = Future()
+        self.stats.record_submit()
+        self._queue.put((future, fn, args, kwargs, time.perf_counter()))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Runs a task on a worker and waits for its result.
+
+        Tasks submitted from one of this executor's own workers run directly,
+        so nested calls cannot deadlock waiting for a free worker.
+        """
+        if self.in_worker():
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def in_worker(self):
+        """
+        Returns whether the calling thread is one of this executor's workers.
+        """
+        return getattr(self._local, 'worker', None) is not None
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._shutdown = True
+        if cancel_futures:
+            while True:
+                try:
+                    task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is not _STOP:
+                    task[0].cancel()
+                    self.stats.record_cancel()
+        for _ in self._workers:
+            self._queue.put(_STOP)
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _configure(self, index):
+        import torch
+
+        torch.set_num_threads(self.intra_op_threads)
+        if self.inter_op_threads and torch.get_num_interop_threads() != self.inter_op_threads:
+            try:
+                torch.set_num_interop_threads(self.inter_op_threads)
+            except RuntimeError:
+                # Already fixed by earlier parallel work or another worker
+                pass
+        if self.pin_cores:
+            # On Linux, pid 0 is the calling thread; torch's intra-op threads inherit its affinity
+            os.sched_setaffinity(0, self.worker_cores[index])
+
+    def _run(self, index):
+        self._local.worker = index
+        configured = False
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                break
+            future, fn, args, kwargs, submitted = task
+            started = time.perf_counter()
+            self.stats.record_start(started - submitted)
+            if not future.set_running_or_notify_cancel():
+                self.stats.record_done(0.0)
+                continue
+            try:
+                if not configured:
+                    self._configure(index)
+                    configured = True
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as exc:
+                future.set_exception(exc)
+            self.stats.record_done(time.perf_counter() - started)
+
+    def as_dict(self):
+        """
+        Returns the configuration and queue counters.
+        """
+        config = {
+            'concurrency': self.concurrency,
+            'intra_op_threads': self.intra_op_threads,
+            'inter_op_threads': self.inter_op_threads,
+            'pinned_cores': self.worker_cores if self.pin_cores else None,
+        }
+        config.update(self.stats.as_dict())
+        return config
+
+
+def set_executor(executor):
+    """
+    Routes all inference through the given executor, or back to the calling threads for None.
+
+    Returns:
+    InferenceExecutor: The previously installed executor, or None.
+    """
+    global _installed
+    previous, _installed = _installed, executor
+    return previous
+
+
+def get_executor():
+    """
+    Returns the installed executor, or None.
+    """
+    return _installed
+
+
+def default_executor():
+    """
+    Returns the installed executor, creating and installing one on first use.
+
+    The executor is configured from the environment:
+    ``SUMMARIZATION_CONCURRENCY`` (default 1), ``SUMMARIZATION_INTRA_OP_THREADS``
+    (default an even share of the cores) and ``SUMMARIZATION_PIN_CORES=1``.
+
+    Returns:
+    InferenceExecutor: The process-wide executor.
+    """
+    global _installed
+    with _default_lock:
+        if _installed is None:
+            _installed = InferenceExecutor(
+                concurrency=int(os.environ.get('SUMMARIZATION_CONCURRENCY', 1)),
+                intra_op_threads=int(os.environ.get('SUMMARIZATION_INTRA_OP_THREADS', 0)) or None,
+                pin_cores=os.environ.get('SUMMARIZATION_PIN_CORES') == '1')
+        return _installed
+
+
+def run_inference(fn, *args, **kwargs):
+    """
+    Runs an inference task on the installed executor, or directly if there is none.
+    """
+    executor = _installed
+    if executor is None:
+        return fn(*args, **kwargs)
+    return executor.run(fn, *args, **kwargs)
+
+
+def submit_inference(fn, *args, **kwargs):
+    """
+    Starts an inference task in the background, for callers that consume its output as it runs.
+
+    The task is queued to the installed executor, or runs on a new daemon
+    thread if there is none.
+
+    Returns:
+    Future: Resolves to the task's return value.
+    """
+    executor = _installed
+    if executor is not None and not executor.in_worker():
+        return executor.submit(fn, *args, **kwargs)
+
+    future = Future()
+
+    def run():
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, name='inference', daemon=True).start()
+    return future
@@ -0,0 +1,111 @@
+"""
+Extractive pre-selection of salient sentences.
+
+``summarize()`` truncates its input, so for long articles BART only sees
+the opening paragraphs. ``preselect`` instead scores every sentence with
+TF-IDF, ranks them with TextRank (PageRank over the sentence similarity
+graph) and keeps the best ones, in document order, up to a token budget.
+The encoder then gets a predictable input size that covers the whole
+document.
+"""
+import re
+
+from .longdoc import split_sentences
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+# PageRank damping factor, as in the TextRank paper
+DAMPING = 0.85
+
+
+def tfidf_matrix(sentences):
+    """
+    Returns the L2-normalized TF-IDF vectors of the sentences.
+
+    Parameters:
+    sentences (list): The sentences.
+
+    Returns:
+    numpy.ndarray: A (sentences x vocabulary) float array.
+    """
+    import numpy as np
+
+    tokenized = [_WORD.findall(sentence.lower()) for sentence in sentences]
+    vocabulary = {}
+    for words in tokenized:
+        for word in words:
+            vocabulary.setdefault(word, len(vocabulary))
+
+    counts = np.zeros((len(sentences), max(len(vocabulary), 1)))
+    for row, words in enumerate(tokenized):
+        np.add.at(counts[row], [vocabulary[word] for word in words], 1)
+    document_frequency = (counts > 0).sum(axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+    weights = counts * idf
+    norms = np.linalg.norm(weights, axis=1, keepdims=True)
+    return weights / np.where(norms == 0, 1, norms)
+
+
+def textrank_scores(sentences, iterations=50, tolerance=1e-6):
+    """
+    Scores sentences by PageRank over their cosine similarity graph.
+
+    Parameters:
+    sentences (list): The sentences.
+    iterations (int): The maximum number of power iterations.
+    tolerance (float): Iteration stops once scores change by less than this.
+
+    Returns:
+    numpy.ndarray: One score per sentence.
+    """
+    import numpy as np
+
+    vectors = tfidf_matrix(sentences)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0)
+    out_weight = similarity.sum(axis=1, keepdims=True)
+    # Sentences sharing no words with any other link to every sentence equally
+    transition = np.where(out_weight > 0, similarity / np.where(out_weight == 0, 1, out_weight),
+                          1 / len(sentences))
+
+    n = len(sentences)
+    scores = np.full(n, 1 / n)
+    for _ in range(iterations):
+        updated = (1 - DAMPING) / n + DAMPING * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def preselect(text, token_budget, tokenizer=None):
+    """
+    Keeps the most salient sentences of a text within a token budget.
+
+    Parameters:
+    text (str): The text to shrink.
+    token_budget (int): The largest number of tokens to keep.
+    tokenizer: Counts sentence tokens exactly if given; otherwise about 4/3 tokens per word are assumed.
+
+    Returns:
+    str: The selected sentences in their original order, or the text unchanged if it already fits
+    or no single sentence fits the budget.
+    """
+    sentences = split_sentences(text)
+    if tokenizer is not None and sentences:
+        lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)['input_ids']]
+    else:
+        lengths = [len(sentence.split()) * 4 // 3 + 1 for sentence in sentences]
+    if sum(lengths) <= token_budget:
+        return text
+
+    scores = textrank_scores(sentences)
+    chosen, used = [], 0
+    for i in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        if used + lengths[i] <= token_budget:
+            chosen.append(i)
+            used += lengths[i]
+    if not chosen:
+        # No sentence fits on its own, e.g. unpunctuated text; leave it to truncation
+        return text
+    return ' '.join(sentences[i] for i in sorted(chosen))
@@ -0,0 +1,135 @@
+"""
+Long-document summarization with chunked map-reduce.
+
+``summarize()`` truncates its input to ``MAX_INPUT_TOKENS`` tokens, so
+anything past that is never seen by the model. Here the text is split on
+sentence boundaries into overlapping windows sized to the model's
+position limit, every window is summarized in batched generate calls,
+and the joined window summaries are summarized again until they fit in a
+single window.
+"""
+import re
+
+from .core import PREFIX, summarize_batch
+from .registry import DEFAULT_DEVICE, DEFAULT_DTYPE, DEFAULT_MODEL, registry
+
+# bart-large-cnn has 1024 learned positions
+MODEL_MAX_TOKENS = 1024
+# Tokens shared between neighbouring windows so sentences at a boundary keep their context
+OVERLAP_TOKENS = 64
+# Upper bound on reduce rounds, in case summaries stop shrinking
+MAX_ROUNDS = 4
+
+_SENTENCE_END = re.compile(r'(?:(?<=[.!?])|(?<=[.!?]["\')\]]))\s+|\n+')
+
+
+def split_sentences(text):
+    """
+    Splits text into sentences on terminal punctuation and line breaks.
+
+    Parameters:
+    text (str): The text to split.
+
+    Returns:
+    list: The non-empty sentences, stripped of surrounding whitespace.
+    """
+    return [s.strip() for s in _SENTENCE_END.split(text) if s and s.strip()]
+
+
+def chunk_sentences(sentences, lengths, max_tokens, overlap_tokens=OVERLAP_TOKENS):
+    """
+    Groups consecutive sentences into windows of at most ``max_tokens`` tokens.
+
+    Each window after the first starts with the trailing sentences of the
+    previous window, up to ``overlap_tokens`` tokens. A single sentence that
+    is longer than ``max_tokens`` becomes a window on its own and is
+    truncated when it is tokenized.
+
+    Parameters:
+    sentences (list): The sentences, in document order.
+    lengths (list): The token count of each sentence.
+    max_tokens (int): The token budget of a window.
+    overlap_tokens (int): The token budget of the overlap between windows.
+
+    Returns:
+    list: The windows, each joined back into a single string.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for sentence, length in zip(sentences, lengths):
+        if current and current_tokens + length > max_tokens:
+            chunks.append(' '.join(s for s, _ in current))
+            # Carry the tail of this window over into the next one
+            overlap, overlap_size = [], 0
+            for s, n in reversed(current):
+                if overlap_size + n > overlap_tokens or overlap_size + n + length > max_tokens:
+                    break
+                overlap.insert(0, (s, n))
+                overlap_size += n
+            current, current_tokens = overlap, overlap_size
+        current.append((sentence, length))
+        current_tokens += length
+    if current:
+        chunks.append(' '.join(s for s, _ in current))
+    return chunks
+
+
+def window_tokens(tokenizer, max_tokens=MODEL_MAX_TOKENS):
+    """
+    Returns the number of text tokens that fit in one model input.
+
+    Parameters:
+    tokenizer: The model's tokenizer.
+    max_tokens (int): The model's input limit, including special tokens.
+
+    Returns:
+    int: The budget left after the prefix and special tokens.
+    """
+    prefix_tokens = len(tokenizer.encode(PREFIX, add_special_tokens=False))
+    return max_tokens - prefix_tokens - tokenizer.num_special_tokens_to_add()
+
+
+def summarize_long(text, max_length=150, min_length=30, num_beams=4,
+                   model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE,
+                   max_tokens=MODEL_MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS, batch_size=8):
+    """
+    Summarizes a text of any length with chunked map-reduce.
+
+    Texts that fit in one model input are summarized directly. Longer texts
+    are split into overlapping sentence windows, the windows are summarized
+    ``batch_size`` at a time, and the joined summaries are reduced the same
+    way until they fit in one input.
+
+    Parameters:
+    text (str): The text to be summarized.
+    max_length (int): The maximum length of the summary, and of each window summary.
+    min_length (int): The minimum length of the summary.
+    num_beams (int): The number of beams for beam search.
+    model_name (str): The model to summarize with.
+    dtype (str): The inference precision: float32, int8 or bfloat16.
+    device (str): The device the model runs on.
+    max_tokens (int): The model's input limit in tokens.
+    overlap_tokens (int): Tokens shared between neighbouring windows.
+    batch_size (int): How many windows are summarized in one generate call.
+
+    Returns:
+    str: The generated summary.
+    """
+    tokenizer = registry.get(model_name, dtype, device).tokenizer
+    budget = window_tokens(tokenizer, max_tokens)
+    params = dict(max_length=max_length, num_beams=num_beams, model_name=model_name,
+                  dtype=dtype, device=device, max_input_tokens=max_tokens)
+
+    for _ in range(MAX_ROUNDS):
+        sentences = split_sentences(text)
+        lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)['input_ids']] if sentences else []
+        # Joining with spaces costs about one token per sentence boundary
+        if sum(lengths) + len(lengths) <= budget:
+            break
+        chunks = chunk_sentences(sentences, lengths, budget, overlap_tokens)
+        summaries = []
+        for start in range(0, len(chunks), batch_size):
+            summaries.extend(summarize_batch(chunks[start:start + batch_size], min_length=0, cache=None, **params))
+        text = ' '.join(summaries)
+
+    return summarize_batch([text], min_length=min_length, cache=None, **params)[0]
@@ -0,0 +1,171 @@
+"""
+Per-stage instrumentation of the summarization path.
+
+Every generate call is split into four stages: tokenize, encode (the
+encoder forward pass), decode (the decoder loop inside
+``model.generate``) and detokenize. When at least one hook is
+registered, a ``StageRecord`` with the time spent in each stage and the
+token counts is passed to every hook after the call.
+
+``PrometheusCollector`` aggregates records into counters and histograms
+for a Prometheus text exposition; ``RecentRecords`` keeps the last few
+records for a debug view.
+"""
+import collections
+import threading
+
+STAGES = ('tokenize', 'encode', 'decode', 'detokenize')
+
+# Upper bounds, in seconds, of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+class StageRecord:
+    """
+    Timings and sizes of one generate call.
+
+    Attributes:
+    batch_size (int): Number of texts in the call.
+    num_beams (int): Beams used by the search.
+    input_tokens (int): Input tokens across the batch, excluding padding.
+    output_tokens (int): Generated tokens across the batch, excluding padding.
+    seconds (dict): Wall time of each stage in STAGES.
+    """
+
+    def __init__(self, batch_size, num_beams):
+        self.batch_size = batch_size
+        self.num_beams = num_beams
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    @property
+    def total_seconds(self):
+        return sum(self.seconds.values())
+
+    def as_dict(self):
+        return {
+            'batch_size': self.batch_size,
+            'num_beams': self.num_beams,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'seconds': dict(self.seconds),
+            'total_seconds': self.total_seconds,
+        }
+
+
+def add_hook(hook):
+    """
+    Registers a callable to receive a StageRecord after every generate call.
+    """
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def remove_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def enabled():
+    """
+    Returns whether any hook is registered, i.e. whether records are collected at all.
+    """
+    return bool(_hooks)
+
+
+def emit(record):
+    for hook in list(_hooks):
+        hook(record)
+
+
+class RecentRecords:
+    """
+    A hook that keeps the most recent records, newest last.
+    """
+
+    def __init__(self, maxlen=20):
+        self.records = collections.deque(maxlen=maxlen)
+
+    def __call__(self, record):
+        self.records.append(record)
+
+    def last(self):
+        return self.records[-1] if self.records else None
+
+
+class PrometheusCollector:
+    """
+    A hook that aggregates records for a Prometheus text exposition.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._beams = collections.Counter()
+        self._sums = dict.fromkeys(STAGES, 0.0)
+        self._bucket_counts = {stage: [0] * len(buckets) for stage in STAGES}
+
+    def __call__(self, record):
+        with self._lock:
+            self.requests += 1
+            self.texts += record.batch_size
+            self.input_tokens += record.input_tokens
+            self.output_tokens += record.output_tokens
+            self._beams[record.num_beams] += 1
+            for stage, seconds in record.seconds.items():
+                self._sums[stage] += seconds
+                counts = self._bucket_counts[stage]
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        counts[i] += 1
+
+    def exposition(self):
+        """
+        Renders the collected metrics in the Prometheus text format.
+
+        Returns:
+        str: The exposition, ending in a newline.
+        """
+        with self._lock:
+            lines = [
+                '# HELP summarization_generate_calls_total Generate calls made.',
+                '# TYPE summarization_generate_calls_total counter',
+                f'summarization_generate_calls_total {self.requests}',
+                '# HELP summarization_texts_total Texts summarized.',
+                '# TYPE summarization_texts_total counter',
+                f'summarization_texts_total {self.texts}',
+                '# HELP summarization_tokens_total Tokens processed, by direction.',
+                '# TYPE summarization_tokens_total counter',
+                f'summarization_tokens_total{{direction="input"}} {self.input_tokens}',
+                f'summarization_tokens_total{{direction="output"}} {self.output_tokens}',
+                '# HELP summarization_generate_calls_by_beams_total Generate calls, by beam count.',
+                '# TYPE summarization_generate_calls_by_beams_total counter',
+            ]
+            lines.extend(f'summarization_generate_calls_by_beams_total{{num_beams="{beams}"}} {count}'
+                         for beams, count in sorted(self._beams.items()))
+            lines.extend([
+                '# HELP summarization_stage_seconds Time spent in each stage of a generate call.',
+                '# TYPE summarization_stage_seconds histogram',
+            ])
+            for stage in STAGES:
+                for bound, count in zip(self.buckets, self._bucket_counts[stage]):
+                    lines.append(f'summarization_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'summarization_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {self.requests}')
+                lines.append(f'summarization_stage_seconds_sum{{stage="{stage}"}} {self._sums[stage]}')
+                lines.append(f'summarization_stage_seconds_count{{stage="{stage}"}} {self.requests}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared collectors; register them with add_hook() to start collecting
+prometheus = PrometheusCollector()
+recent = RecentRecords()
@@ -0,0 +1,226 @@
+"""
+Adaptive generation parameters.
+
+``summarize()`` defaults to ``num_beams=4, max_length=150, min_length=30``
+whatever the input. A ``GenerationPolicy`` instead picks the beam count
+and summary length for each request from its input length, an optional
+latency budget and the current load:
+
+- Short inputs get short summaries and greedy decoding.
+- Under a latency budget, the widest beam search whose estimated latency fits is used,
+  shortening the summary if even greedy decoding would not fit.
+- Under heavy load every request decodes greedily.
+
+Latency is estimated by a ``LatencyModel``. The shared policy's model is
+calibrated from the stage timings in ``summarization.metrics`` once
+``summarize_adaptive`` is first called, so importing this module does not
+turn on metrics collection. Every decision is recorded with the name of
+the rule that produced it.
+"""
+import collections
+import threading
+
+from . import metrics
+from .core import MAX_INPUT_TOKENS, PREFIX, summarize_batch
+from .registry import DEFAULT_DEVICE, DEFAULT_DTYPE, DEFAULT_MODEL, registry
+
+# Weight of each new observation in the latency model's moving averages
+CALIBRATION_WEIGHT = 0.2
+
+
+class LatencyModel:
+    """
+    Estimates the latency of one summary.
+
+    ``seconds = overhead + encode * input_tokens + step * max_length * (1 + beam_cost * (num_beams - 1))``
+
+    Parameters:
+    overhead (float): Fixed seconds per call.
+    encode (float): Encoder seconds per input token.
+    step (float): Seconds per greedy decoder step.
+    beam_cost (float): Extra cost of each additional beam relative to one.
+    """
+
+    def __init__(self, overhead=0.02, encode=0.0004, step=0.03, beam_cost=0.35):
+        self.overhead = overhead
+        self.encode = encode
+        self.step = step
+        self.beam_cost = beam_cost
+        self._lock = threading.Lock()
+
+    def beam_factor(self, num_beams):
+        return 1 + self.beam_cost * (num_beams - 1)
+
+    def estimate(self, input_tokens, num_beams, max_length):
+        return self.overhead + self.encode * input_tokens + self.step * max_length * self.beam_factor(num_beams)
+
+    def __call__(self, record):
+        """
+        Calibrates the per-token costs from a StageRecord; register with ``metrics.add_hook``.
+
+        Only single-text calls are used: the model estimates one summary, and a batch
+        decodes until its longest summary is done, with its inputs padded to the longest.
+        """
+        if record.batch_size != 1:
+            return
+        with self._lock:
+            if record.input_tokens and record.seconds['encode']:
+                encode = record.seconds['encode'] / record.input_tokens
+                self.encode += CALIBRATION_WEIGHT * (encode - self.encode)
+            steps = record.output_tokens / record.batch_size
+            if steps and record.seconds['decode']:
+                step = record.seconds['decode'] / (steps * self.beam_factor(record.num_beams))
+                self.step += CALIBRATION_WEIGHT * (step - self.step)
+
+
+class PolicyDecision:
+    """
+    The generation parameters chosen for one request.
+
+    Attributes:
+    policy (str): The rule that produced the decision.
+    num_beams (int): The beam count.
+    max_length (int): The maximum summary length.
+    min_length (int): The minimum summary length.
+    input_tokens (int): The tokenized input length the decision was based on.
+    estimated_seconds (float): The latency the model predicts for these parameters.
+    """
+
+    def __init__(self, policy, num_beams, max_length, min_length, input_tokens, estimated_seconds):
+        self.policy = policy
+        self.num_beams = num_beams
+        self.max_length = max_length
+        self.min_length = min_length
+        self.input_tokens = input_tokens
+        self.estimated_seconds = estimated_seconds
+
+    def generation(self):
+        return {'num_beams': self.num_beams, 'max_length': self.max_length, 'min_length': self.min_length}
+
+    def as_dict(self):
+        return {'policy': self.policy, 'input_tokens': self.input_tokens,
+                'estimated_seconds': self.estimated_seconds, **self.generation()}
+
+    def __repr__(self):
+        return f"PolicyDecision({self.as_dict()!r})"
+
+
+class GenerationPolicy:
+    """
+    Chooses generation parameters per request.
+
+    Parameters:
+    latency_model (LatencyModel): The latency estimator.
+    beam_options (tuple): Beam counts to consider, widest first.
+    max_length (int): The summary length for long inputs.
+    min_length (int): The minimum summary length for long inputs.
+    summary_ratio (float): Summaries of shorter inputs are capped at this fraction of the input length.
+    short_input_tokens (int): Inputs up to this length decode greedily.
+    high_load (int): At this many requests in flight, every request decodes greedily.
+    """
+
+    def __init__(self, latency_model=None, beam_options=(4, 2, 1), max_length=150, min_length=30,
+                 summary_ratio=0.5, short_input_tokens=128, high_load=8):
+        self.latency_model = latency_model or LatencyModel()
+        self.beam_options = beam_options
+        self.max_length = max_length
+        self.min_length = min_length
+        self.summary_ratio = summary_ratio
+        self.short_input_tokens = short_input_tokens
+        self.high_load = high_load
+        self.applied = collections.Counter()
+        self.recent = collections.deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def decide(self, input_tokens, latency_budget=None, load=0):
+        """
+        Chooses the generation parameters for one request.
+
+        Parameters:
+        input_tokens (int): The tokenized input length.
+        latency_budget (float): Seconds the request must finish within, or None.
+        load (int): Requests currently in flight or queued.
+
+        Returns:
+        PolicyDecision: The chosen parameters, also recorded in ``applied`` and ``recent``.
+        """
+        estimate = self.latency_model.estimate
+        max_length = max(min(self.max_length, int(input_tokens * self.summary_ratio)), 16)
+        min_length = min(self.min_length, max_length // 2)
+
+        if load >= self.high_load:
+            decision = ('high_load', 1, max_length)
+        elif input_tokens <= self.short_input_tokens:
+            decision = ('short_input', 1, max_length)
+        elif latency_budget is None:
+            decision = ('default', self.beam_options[0], max_length)
+        else:
+            fitting = [beams for beams in self.beam_options
+                       if estimate(input_tokens, beams, max_length) <= latency_budget]
+            if fitting:
+                decision = ('latency_budget', fitting[0], max_length)
+            else:
+                # Even greedy decoding is too slow: shorten the summary to what the budget allows
+                model = self.latency_model
+                steps = (latency_budget - model.overhead - model.encode * input_tokens) / model.step
+                decision = ('latency_budget_truncated', 1, max(int(steps), 16))
+
+        policy, num_beams, max_length = decision
+        min_length = min(min_length, max_length // 2)
+        result = PolicyDecision(policy, num_beams, max_length, min_length, input_tokens,
+                                estimate(input_tokens, num_beams, max_length))
+        with self._lock:
+            self.applied[policy] += 1
+            self.recent.append(result)
+        return result
+
+    def stats(self):
+        """
+        Returns how often each rule has been applied.
+        """
+        with self._lock:
+            return dict(self.applied)
+
+
+def summarize_adaptive(text, latency_budget=None, load=0, policy=None,
+                       model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE):
+    """
+    Summarizes the given text with parameters chosen by a generation policy.
+
+    Parameters:
+    text (str): The text to be summarized.
+    latency_budget (float): Seconds the summary must be ready within, or None.
+    load (int): Requests currently in flight or queued.
+    policy (GenerationPolicy): The policy to apply, defaults to the shared one, whose latency model
+        starts calibrating from the stage timings on the first call.
+    model_name (str): The model to summarize with.
+    dtype (str): The inference precision: float32, int8 or bfloat16.
+    device (str): The device the model runs on.
+
+    Returns:
+    tuple: The generated summary and the PolicyDecision that was applied.
+    """
+    if policy is None:
+        policy = default_policy
+        _start_calibration()
+    tokenizer = registry.get(model_name, dtype, device).tokenizer
+    input_tokens = len(tokenizer.encode(PREFIX + text, max_length=MAX_INPUT_TOKENS, truncation=True))
+    decision = policy.decide(input_tokens, latency_budget, load)
+    summary = summarize_batch([text], model_name=model_name, dtype=dtype, device=device,
+                              **decision.generation())[0]
+    return summary, decision
+
+
+# The policy shared by every caller in this process; its latency model learns from the stage timings
+default_policy = GenerationPolicy()
+_calibrating = False
+_calibration_lock = threading.Lock()
+
+
+def _start_calibration():
+    # Registering a hook turns on metrics collection for every generate call, so wait until it is needed
+    global _calibrating
+    with _calibration_lock:
+        if not _calibrating:
+            metrics.add_hook(default_policy.latency_model)
+            _calibrating = True
@@ -0,0 +1,126 @@
+"""
+Reduced-precision inference modes for CPU serving.
+
+A precision is passed to the registry as the ``dtype`` part of the model
+key:
+
+- ``float32``: the weights as published.
+- ``int8``: fp32 weights with every ``nn.Linear`` dynamically quantized to int8.
+- ``bfloat16``: bf16 weights, only on CPUs with native bf16 instructions.
+
+``precision_report`` measures what each mode costs in ROUGE and buys in latency on a fixed sample.
+"""
+import time
+
+PRECISIONS = ('float32', 'int8', 'bfloat16')
+
+# CPU flags that mean bf16 matmuls run natively rather than being emulated
+_BF16_FLAGS = ('avx512_bf16', 'amx_bf16')
+
+
+def cpu_supports_bf16():
+    """
+    Returns whether the CPU has native bf16 instructions.
+
+    Returns:
+    bool: True on CPUs advertising AVX512-BF16 or AMX-BF16.
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            flags = f.read().split()
+    except OSError:
+        return False
+    return any(flag in flags for flag in _BF16_FLAGS)
+
+
+def apply_precision(model, precision, device='cpu'):
+    """
+    Converts a freshly loaded fp32 model to the given precision.
+
+    Parameters:
+    model: The fp32 model.
+    precision (str): One of PRECISIONS.
+    device (str): The device the model will run on.
+
+    Returns:
+    The converted model.
+    """
+    import torch
+
+    if precision == 'float32':
+        return model
+    if precision == 'int8':
+        if device != 'cpu':
+            raise ValueError("int8 dynamic quantization is only supported on CPU")
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if precision == 'bfloat16':
+        if device == 'cpu' and not cpu_supports_bf16():
+            raise ValueError("bfloat16 inference needs a CPU with AVX512-BF16 or AMX support")
+        return model.to(torch.bfloat16)
+    raise ValueError(f"Unknown precision {precision!r}, expected one of {', '.join(PRECISIONS)}")
+
+
+def precision_report(samples, precisions=PRECISIONS, model_name=None, **generation):
+    """
+    Compares inference precisions on a fixed sample.
+
+    Every mode summarizes the same articles one at a time with the summary
+    and encoder caches disabled. ROUGE is computed with
+    ``compute_rouge_scores`` and reported next to its difference from the
+    fp32 run.
+
+    Models the report loads are unloaded after their run. Models that were
+    already loaded, e.g. by a serving process, are left in place.
+
+    Parameters:
+    samples (list): (article, reference summary) pairs.
+    precisions (tuple): The precisions to compare. Unsupported ones are reported as skipped.
+    model_name (str): The model to load, defaults to the registry's default.
+    **generation: Generation parameters passed on to ``summarize``.
+
+    Returns:
+    dict: For each precision, its load time, resident memory, mean latency,
+    mean ROUGE F-measures and their change from fp32, or the reason it was skipped.
+    """
+    from .core import summarize
+    from .evaluation import ROUGE_TYPES, compute_rouge_scores
+    from .registry import DEFAULT_MODEL, registry
+
+    model_name = model_name or DEFAULT_MODEL
+    report = {}
+    for precision in precisions:
+        preloaded = registry.is_loaded(model_name, precision)
+        try:
+            loaded = registry.get(model_name, precision)
+        except ValueError as exc:
+            report[precision] = {'skipped': str(exc)}
+            continue
+
+        latencies = []
+        totals = dict.fromkeys(ROUGE_TYPES, 0.0)
+        for article, reference in samples:
+            start = time.perf_counter()
+            summary = summarize(article, model_name=model_name, dtype=precision, cache=None, encoder_cache=None,
+                                **generation)
+            latencies.append(time.perf_counter() - start)
+            scores = compute_rouge_scores(reference, summary)
+            for name in ROUGE_TYPES:
+                totals[name] += scores[name].fmeasure
+
+        report[precision] = {
+            'load_seconds': loaded.load_seconds,
+            'rss_mb': loaded.rss_bytes / 2**20,
+            'mean_latency': sum(latencies) / len(latencies),
+            'rouge': {name: total / len(samples) for name, total in totals.items()},
+        }
+        # Free this mode's weights before loading the next one, unless someone else is using them
+        if not preloaded:
+            registry.unload(model_name, precision)
+
+    baseline = report.get('float32', {}).get('rouge')
+    if baseline:
+        for entry in report.values():
+            if 'rouge' in entry:
+                entry['rouge_delta'] = {name: entry['rouge'][name] - baseline[name] for name in baseline}
+                entry['speedup'] = report['float32']['mean_latency'] / entry['mean_latency']
+    return report
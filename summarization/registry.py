@@ -0,0 +1,152 @@
+"""
+Process-wide registry of loaded tokenizer/model pairs.
+
+Streamlit re-executes the app script on every widget interaction, but
+imported modules stay cached in ``sys.modules`` for the lifetime of the
+server process. Keeping the loaded models here means every session and
+every rerun shares a single instance instead of reloading the weights.
+"""
+import os
+import threading
+import time
+
+from .backends import DEFAULT_BACKEND
+
+DEFAULT_MODEL = 'facebook/bart-large-cnn'
+DEFAULT_DTYPE = 'float32'
+DEFAULT_DEVICE = 'cpu'
+
+
+def current_rss():
+    """
+    Returns the resident set size of the current process.
+
+    Returns:
+    int: Resident memory in bytes, or 0 if it cannot be determined.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak, in kilobytes on Linux and bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if os.uname().sysname == 'Darwin' else usage * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+class LoadedModel:
+    """
+    A tokenizer/model pair together with the cost of loading it.
+
+    Attributes:
+    key (tuple): The (model_name, precision, device, backend) registry key.
+    tokenizer: The loaded tokenizer.
+    backend (InferenceBackend): Runs the encoder and decoding loop, see ``summarization.backends``.
+    model: The backend's underlying model.
+    load_seconds (float): Wall time spent loading the tokenizer and model.
+    rss_bytes (int): Growth of the process resident memory during the load.
+    """
+
+    def __init__(self, key, tokenizer, backend, load_seconds, rss_bytes):
+        self.key = key
+        self.tokenizer = tokenizer
+        self.backend = backend
+        self.model = backend.model
+        self.load_seconds = load_seconds
+        self.rss_bytes = rss_bytes
+
+    def __repr__(self):
+        return (f"LoadedModel({self.key!r}, load_seconds={self.load_seconds:.2f}, "
+                f"rss_mb={self.rss_bytes / 2**20:.0f})")
+
+
+def _load(model_name, dtype, device, backend):
+    # Imported first, so offline mode disables the hub before transformers is imported
+    from .snapshot import resolve_model
+
+    from transformers import BartTokenizerFast
+
+    from .backends import load_backend
+
+    # Offline, this is the snapshot copy of the model, see ``summarization.snapshot``
+    path = resolve_model(model_name)
+    tokenizer = BartTokenizerFast.from_pretrained(path)
+    return tokenizer, load_backend(backend, path, dtype, device)
+
+
+class ModelRegistry:
+    """
+    Lazily loads models on first use and shares them across callers.
+
+    Models are keyed by name, dtype, device and inference backend. Loading
+    is guarded by a per-key lock so concurrent sessions asking for the same
+    model wait for a single load instead of each starting their own.
+
+    Attributes:
+    backend (str): The backend used when ``get`` is not given one, see ``summarization.backends``.
+    """
+
+    def __init__(self, loader=_load, backend=DEFAULT_BACKEND):
+        self._loader = loader
+        self.backend = backend
+        self._models = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE, backend=None):
+        """
+        Returns the loaded model for the given key, loading it if needed.
+
+        Parameters:
+        model_name (str): The Hugging Face model id or local path.
+        dtype (str): The inference precision, one of ``precision.PRECISIONS``.
+        device (str): The torch device to place the model on.
+        backend (str): The inference backend, defaults to ``self.backend``.
+
+        Returns:
+        LoadedModel: The shared tokenizer/model pair.
+        """
+        key = (model_name, dtype, device, backend or self.backend)
+        loaded = self._models.get(key)
+        if loaded is not None:
+            return loaded
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        with key_lock:
+            loaded = self._models.get(key)
+            if loaded is None:
+                rss_before = current_rss()
+                start = time.perf_counter()
+                tokenizer, runner = self._loader(*key)
+                load_seconds = time.perf_counter() - start
+                loaded = LoadedModel(key, tokenizer, runner, load_seconds, max(current_rss() - rss_before, 0))
+                self._models[key] = loaded
+        return loaded
+
+    def loaded(self):
+        """
+        Returns the models loaded so far.
+
+        Returns:
+        list: The LoadedModel instances, in load order.
+        """
+        return list(self._models.values())
+
+    def is_loaded(self, model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE, backend=None):
+        return (model_name, dtype, device, backend or self.backend) in self._models
+
+    def unload(self, model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE, backend=None):
+        """
+        Drops a model from the registry so its memory can be reclaimed.
+        """
+        self._models.pop((model_name, dtype, device, backend or self.backend), None)
+
+
+# The registry shared by every caller in this process
+registry = ModelRegistry()
@@ -0,0 +1,237 @@
+"""
+Multi-process evaluation over the CNN/DailyMail test split.
+
+The split is cut into fixed-size shards that a pool of worker processes
+evaluates with ``batch_summarize_and_evaluate``. Each worker loads the
+model once and limits torch to its share of the cores. Every finished
+shard is written to its own JSONL file, named by its sample range, so a
+rerun after a crash skips the shards that are already done. The output
+directory records the generation settings in ``run.json``, and a rerun
+with different settings is refused instead of mixing results.
+
+Usage:
+python -m summarization.runner OUTPUT_DIR --num-samples 11490 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+from .aggregate import RougeAggregator
+from .bucketing import DEFAULT_TOKEN_BUDGET
+from .registry import DEFAULT_MODEL
+
+SCORE_FIELDS = ('precision', 'recall', 'fmeasure')
+MANIFEST_NAME = 'run.json'
+# Options that change how samples are batched or scored, but not the summaries
+EXECUTION_OPTIONS = ('batch_size', 'slice_size', 'token_budget', 'token_cache_dir', 'rouge_processes')
+
+# Per-process state set up by _init_worker
+_dataset = None
+_worker_config = None
+
+
+def shard_path(output_dir, first, count):
+    # The range is part of the name, so a rerun with another start or shard size never reuses a shard
+    return os.path.join(output_dir, f'shard-{first:06d}-{count:05d}.jsonl')
+
+
+def check_manifest(output_dir, settings):
+    """
+    Records the generation settings of a run, or checks them against the recorded ones.
+
+    Parameters:
+    output_dir (str): The directory shard results are written to.
+    settings (dict): The settings that determine the summaries, e.g. model_name and num_beams.
+
+    Raises:
+    ValueError: If the directory holds results generated with other settings.
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            recorded = json.load(f)
+        if recorded != settings:
+            changed = sorted(name for name in set(recorded) | set(settings)
+                             if recorded.get(name) != settings.get(name))
+            differences = ', '.join(f"{name} was {recorded.get(name)!r}, now {settings.get(name)!r}"
+                                    for name in changed)
+            raise ValueError(f"{output_dir} holds results generated with other settings ({differences}); "
+                             f"use a new output directory")
+        return
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def shard_ranges(start, num_samples, shard_size):
+    """
+    Splits the sample range into consecutive shards.
+
+    Returns:
+    list: (shard index, first sample, number of samples) tuples.
+    """
+    return [(i, first, min(shard_size, start + num_samples - first))
+            for i, first in enumerate(range(start, start + num_samples, shard_size))]
+
+
+def _init_worker(dataset_name, dataset_config, torch_threads, config):
+    global _dataset, _worker_config
+    import torch
+
+    from .snapshot import load_dataset
+
+    # Without this every worker starts one intra-op thread per core
+    torch.set_num_threads(torch_threads)
+    torch.set_num_interop_threads(1)
+    _dataset = load_dataset(dataset_name, dataset_config)
+    _worker_config = dict(config)
+    # Each worker maps the token cache itself; the mapping is shared through the page cache
+    token_cache_dir = _worker_config.pop('token_cache_dir', None)
+    if token_cache_dir:
+        from .tokcache import TokenCache
+        _worker_config['token_cache'] = TokenCache(token_cache_dir)
+
+
+def _run_shard(task):
+    from .evaluation import batch_summarize_and_evaluate
+
+    shard, first, count, path = task
+    results = batch_summarize_and_evaluate(_dataset, num_samples=count, start=first, keep_text=False,
+                                           **_worker_config)
+    # Write to a temporary file first so a crash never leaves a partial shard behind
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for offset, result in enumerate(results):
+            f.write(json.dumps({
+                'index': first + offset,
+                'reference_summary': result['reference_summary'],
+                'generated_summary': result['generated_summary'],
+                'rouge_scores': {name: dict(zip(SCORE_FIELDS, score))
+                                 for name, score in result['rouge_scores'].items()},
+            }) + '\n')
+    os.replace(path + '.tmp', path)
+    return shard, count
+
+
+def read_results(output_dir, paths=None):
+    """
+    Reads the per-sample results of finished shards, in sample order.
+
+    Parameters:
+    output_dir (str): The directory the shards were written to.
+    paths (list): The shard files to read, defaults to every shard in the directory.
+
+    Returns:
+    list: The per-sample result dictionaries.
+    """
+    if paths is None:
+        paths = [os.path.join(output_dir, name) for name in sorted(os.listdir(output_dir))
+                 if name.startswith('shard-') and name.endswith('.jsonl')]
+    results = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            results.extend(json.loads(line) for line in f)
+    results.sort(key=lambda result: result['index'])
+    return results
+
+
+def aggregate_scores(results):
+    """
+    Averages the ROUGE scores of a list of results.
+
+    Returns:
+    dict: The mean precision, recall and F-measure of each ROUGE type.
+    """
+    totals = {}
+    for result in results:
+        for name, score in result['rouge_scores'].items():
+            total = totals.setdefault(name, dict.fromkeys(SCORE_FIELDS, 0.0))
+            for field in SCORE_FIELDS:
+                total[field] += score[field]
+    return {name: {field: value / len(results) for field, value in total.items()}
+            for name, total in totals.items()}
+
+
+def run_sharded_evaluation(output_dir, num_samples, workers=None, shard_size=250, start=0,
+                           dataset_name='cnn_dailymail', dataset_config='3.0.0', **config):
+    """
+    Evaluates the test split across a pool of worker processes.
+
+    Parameters:
+    output_dir (str): The directory shard results are written to and resumed from.
+    num_samples (int): The number of samples to evaluate.
+    workers (int): The number of worker processes, defaults to the number of cores.
+    shard_size (int): The number of samples per shard.
+    start (int): The index of the first sample.
+    dataset_name (str): The dataset to load in each worker.
+    dataset_config (str): The dataset configuration.
+    **config: Arguments passed on to ``batch_summarize_and_evaluate``, e.g. batch_size or num_beams,
+        plus token_cache_dir to read precomputed input ids from a ``summarization.tokcache`` directory.
+        All but the EXECUTION_OPTIONS must match the ones recorded in output_dir, if any.
+
+    Returns:
+    dict: The merged per-sample results, their mean ROUGE scores, and the
+    F-measure mean, median and bootstrap confidence interval of each ROUGE type.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    settings = {name: value for name, value in config.items() if name not in EXECUTION_OPTIONS}
+    settings.update(dataset_name=dataset_name, dataset_config=dataset_config)
+    check_manifest(output_dir, settings)
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    torch_threads = max(1, cores // workers)
+
+    tasks = [(shard, first, count, shard_path(output_dir, first, count))
+             for shard, first, count in shard_ranges(start, num_samples, shard_size)]
+    pending = [task for task in tasks if not os.path.exists(task[3])]
+    print(f"{len(tasks) - len(pending)} of {len(tasks)} shards already done", file=sys.stderr)
+
+    if pending:
+        # spawn, so workers do not inherit a forked copy of torch's thread pools
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(workers, initializer=_init_worker,
+                          initargs=(dataset_name, dataset_config, torch_threads, config)) as pool:
+            for done, (shard, count) in enumerate(pool.imap_unordered(_run_shard, pending), 1):
+                print(f"shard {shard} done ({count} samples), {done}/{len(pending)}", file=sys.stderr)
+
+    results = read_results(output_dir, [task[3] for task in tasks])
+    aggregator = RougeAggregator()
+    for result in results:
+        aggregator.add({name: tuple(score[field] for field in SCORE_FIELDS)
+                        for name, score in result['rouge_scores'].items()})
+    return {
+        'results': results,
+        'rouge': aggregate_scores(results) if results else {},
+        'rouge_summary': aggregator.summary(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate summaries on CNN/DailyMail across worker processes.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--num-samples', type=int, default=1000)
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--shard-size', type=int, default=250)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET)
+    parser.add_argument('--num-beams', type=int, default=4)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--token-cache', default=None, help="A directory written by summarization.tokcache.")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_sharded_evaluation(args.output_dir, args.num_samples, workers=args.workers,
+                                         shard_size=args.shard_size, start=args.start, batch_size=args.batch_size,
+                                         token_budget=args.token_budget,
+                                         num_beams=args.num_beams, model_name=args.model,
+                                         token_cache_dir=args.token_cache)
+    except ValueError as exc:
+        sys.exit(f"error: {exc}")
+    print(json.dumps({'samples': len(summary['results']), 'rouge': summary['rouge'],
+                      'rouge_summary': summary['rouge_summary']}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
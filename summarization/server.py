@@ -0,0 +1,295 @@
+"""
+Headless HTTP/JSON summarization service.
+
+A small asyncio HTTP/1.1 server for backend callers that cannot go
+through the Streamlit UI:
+
+- ``POST /summarize`` with ``{"text": ..., "max_length": ..., ...}`` returns ``{"summary": ...}``.
+  With ``"latency_budget_ms"`` or ``"adaptive": true`` the generation parameters are chosen by
+  ``summarization.policy`` instead, and the applied policy is returned alongside the summary.
+- ``POST /summarize/batch`` with ``{"texts": [...], ...}`` returns ``{"summaries": [...]}``.
+  At most ``MAX_BATCH_TEXTS`` texts are accepted per request. Like ``BatchScheduler``, the texts are
+  sorted by token length and split into generate calls under a padded-token budget.
+- ``GET /health`` reports whether the model is loaded, the inference queue depth and wait times, and
+  how much padding the length bucketing saved.
+- ``GET /metrics`` returns the Prometheus exposition from ``summarization.metrics``.
+
+Inference runs on a ``summarization.executor.InferenceExecutor`` so the
+event loop never blocks and the workers split the cores between them.
+When more than ``max_queue`` requests are waiting for the pool the
+server answers 429, and requests that take longer than ``timeout``
+seconds get 504.
+
+Usage:
+python -m summarization.server --port 8000 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from . import metrics, snapshot
+from .bucketing import DEFAULT_TOKEN_BUDGET, PaddingStats, token_budget_batches, token_lengths
+from .core import summarize_batch
+from .executor import InferenceExecutor
+from .policy import summarize_adaptive
+from .registry import DEFAULT_MODEL, registry
+
+# Generation parameters a request may set, with their allowed range. The upper bounds keep one
+# request from exhausting memory: beams multiply the decoder state, and BART has 1024 positions.
+GENERATION_PARAMS = {'max_length': (1, 1024), 'min_length': (0, 1024), 'num_beams': (1, 16)}
+MAX_BODY_BYTES = 10 * 2**20
+# The most texts one /summarize/batch request may send
+MAX_BATCH_TEXTS = 64
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 429: 'Too Many Requests', 500: 'Internal Server Error',
+            504: 'Gateway Timeout'}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class SummarizationServer:
+    """
+    Serves summarize_batch over HTTP.
+
+    Parameters:
+    workers (int): Threads running inference concurrently.
+    max_queue (int): Requests allowed to wait for a worker before new ones are rejected with 429.
+    timeout (float): Seconds a request may take before it is answered with 504.
+    model_name (str): The model to serve.
+    intra_op_threads (int): torch threads per worker, defaults to an even share of the cores.
+    pin_cores (bool): Pin each worker to its own cores, see ``summarization.executor``.
+    token_budget (int): The largest padded input size, in tokens, of one generate call for a batch request.
+    """
+
+    def __init__(self, workers=1, max_queue=16, timeout=60.0, model_name=DEFAULT_MODEL, intra_op_threads=None,
+                 pin_cores=False, token_budget=DEFAULT_TOKEN_BUDGET):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.model_name = model_name
+        self.executor = InferenceExecutor(workers, intra_op_threads=intra_op_threads, pin_cores=pin_cores)
+        self.token_budget = token_budget
+        self.padding = PaddingStats()
+        self.in_flight = 0
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                try:
+                    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                    headers = await self._read_headers(reader)
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY_BYTES:
+                        raise HTTPError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.dispatch(method, path, body)
+                except HTTPError as exc:
+                    status, payload = exc.status, {'error': exc.message}
+                except (ValueError, asyncio.IncompleteReadError):
+                    status, payload = 400, {'error': "Malformed request"}
+                    headers = {'connection': 'close'}
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader):
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                return headers
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def dispatch(self, method, path, body):
+        routes = {
+            '/health': ('GET', self.health),
+            '/metrics': ('GET', self.metrics),
+            '/summarize': ('POST', self.summarize),
+            '/summarize/batch': ('POST', self.summarize_batch),
+        }
+        if path not in routes:
+            raise HTTPError(404, f"No route for {path}")
+        expected, handler = routes[path]
+        if method != expected:
+            raise HTTPError(405, f"{path} only accepts {expected}")
+        if method == 'POST':
+            try:
+                request = json.loads(body or b'{}')
+            except ValueError:
+                raise HTTPError(400, "Request body is not valid JSON") from None
+            if not isinstance(request, dict):
+                raise HTTPError(400, "Request body must be a JSON object")
+            return await handler(request)
+        return await handler()
+
+    async def health(self):
+        return 200, {
+            'status': 'ok',
+            'model': self.model_name,
+            'model_loaded': registry.is_loaded(self.model_name),
+            'snapshot': snapshot.active_snapshot()['version'] if snapshot.SNAPSHOT else None,
+            'in_flight': self.in_flight,
+            'max_queue': self.max_queue,
+            'executor': self.executor.as_dict(),
+            'padding': self.padding.as_dict(),
+        }
+
+    async def metrics(self):
+        return 200, metrics.prometheus.exposition()
+
+    async def summarize(self, request):
+        text = request.get('text')
+        if not isinstance(text, str):
+            raise HTTPError(400, "'text' must be a string")
+        if request.get('adaptive') or 'latency_budget_ms' in request:
+            return await self._summarize_adaptive(text, request)
+        summaries = await self._run([text], request)
+        return 200, {'summary': summaries[0]}
+
+    async def _summarize_adaptive(self, text, request):
+        budget = request.get('latency_budget_ms')
+        if budget is not None and (isinstance(budget, bool) or not isinstance(budget, (int, float)) or budget <= 0):
+            raise HTTPError(400, "'latency_budget_ms' must be a positive number")
+        # The policy decides how much work fits, so the load it sees includes the queue
+        load = self.in_flight
+        summary, decision = await self._submit(lambda: summarize_adaptive(
+            text, latency_budget=budget / 1000 if budget else None, load=load, model_name=self.model_name))
+        return 200, {'summary': summary, 'policy': decision.as_dict()}
+
+    async def summarize_batch(self, request):
+        texts = request.get('texts')
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise HTTPError(400, "'texts' must be a list of strings")
+        if len(texts) > MAX_BATCH_TEXTS:
+            raise HTTPError(413, f"At most {MAX_BATCH_TEXTS} texts per request, got {len(texts)}")
+        return 200, {'summaries': await self._run(texts, request)}
+
+    async def _run(self, texts, request):
+        params = {}
+        for name, (smallest, largest) in GENERATION_PARAMS.items():
+            if name in request:
+                value = request[name]
+                # bool is a subclass of int, but true is not a length
+                if isinstance(value, bool) or not isinstance(value, int) or not smallest <= value <= largest:
+                    raise HTTPError(400, f"'{name}' must be an integer from {smallest} to {largest}")
+                params[name] = value
+        if params.get('min_length', 0) > params.get('max_length', float('inf')):
+            raise HTTPError(400, "'min_length' must not exceed 'max_length'")
+
+        return await self._submit(lambda: self._summarize_bucketed(texts, params))
+
+    def _summarize_bucketed(self, texts, params):
+        # Length-sorted buckets under the token budget, as BatchScheduler runs them
+        lengths = self._token_lengths(texts)
+        batches = token_budget_batches(lengths, self.token_budget)
+        self.padding.record(lengths, batches, [list(range(len(texts)))])
+        summaries = [None] * len(texts)
+        for indices in batches:
+            batch = summarize_batch([texts[i] for i in indices], model_name=self.model_name, **params)
+            for i, summary in zip(indices, batch):
+                summaries[i] = summary
+        return summaries
+
+    def _token_lengths(self, texts):
+        return token_lengths(texts, registry.get(self.model_name).tokenizer)
+
+    async def _submit(self, work):
+        # Requests beyond the workers wait in the executor queue; cap how many can wait
+        if self.in_flight >= self.workers + self.max_queue:
+            raise HTTPError(429, "Too many requests in flight, retry later")
+        self.in_flight += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, work)
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # The worker thread cannot be interrupted; it finishes and its result is dropped
+            raise HTTPError(504, f"Summarization took longer than {self.timeout:g}s") from None
+        except Exception as exc:
+            raise HTTPError(500, f"Summarization failed: {exc}")
+        finally:
+            self.in_flight -= 1
+
+    async def serve(self, host='127.0.0.1', port=8000, preload=True):
+        """
+        Starts serving and runs until cancelled.
+
+        Parameters:
+        host (str): The interface to listen on.
+        port (int): The port to listen on.
+        preload (bool): Load the model before accepting requests.
+        """
+        if preload:
+            loop = asyncio.get_running_loop()
+            loaded = await loop.run_in_executor(self.executor, registry.get, self.model_name)
+            print(f"Loaded {self.model_name} in {loaded.load_seconds:.1f}s", file=sys.stderr)
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve summarization over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--max-queue', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--no-preload', action='store_true', help="Load the model on the first request instead.")
+    parser.add_argument('--intra-op-threads', type=int, default=None,
+                        help="torch threads per worker, defaults to an even share of the cores.")
+    parser.add_argument('--pin-cores', action='store_true', help="Pin each worker to its own cores (Linux only).")
+    parser.add_argument('--token-budget', type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help="The largest padded input size, in tokens, of one generate call.")
+    args = parser.parse_args(argv)
+
+    try:
+        # Offline, check the snapshot up front even when the model is loaded lazily
+        snapshot.resolve_model(args.model)
+    except snapshot.SnapshotError as exc:
+        sys.exit(f"error: {exc}")
+
+    metrics.add_hook(metrics.prometheus)
+    server = SummarizationServer(args.workers, args.max_queue, args.timeout, args.model, args.intra_op_threads,
+                                 args.pin_cores, args.token_budget)
+    try:
+        asyncio.run(server.serve(args.host, args.port, preload=not args.no_preload))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""
+Versioned local snapshots of models and datasets, for hosts without network access.
+
+``create_snapshot`` packs one or more models with their tokenizers and
+a slice of a dataset split into a new version directory under a
+snapshot root, together with a manifest of every file's size and
+SHA-256 checksum:
+
+    ROOT/
+        CURRENT                 the name of the latest complete version
+        20240501-120000/
+            manifest.json
+            models/facebook--bart-large-cnn/...
+            dataset/...
+
+Setting ``SUMMARIZATION_SNAPSHOT`` to a snapshot root or version
+directory switches the process to offline mode. The hub is disabled,
+models are loaded from the snapshot under their original names, and
+``load_dataset`` reads the packed slice. The checksums are verified on
+first use. A missing or corrupt snapshot, or a model or dataset it does
+not contain, raises ``SnapshotError`` instead of attempting a download.
+
+Usage:
+python -m summarization.snapshot create /srv/snapshots --num-samples 1000
+python -m summarization.snapshot verify /srv/snapshots
+SUMMARIZATION_SNAPSHOT=/srv/snapshots python -m summarization.server
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+
+SNAPSHOT = os.environ.get('SUMMARIZATION_SNAPSHOT')
+MANIFEST_NAME = 'manifest.json'
+CURRENT_NAME = 'CURRENT'
+FORMAT_VERSION = 1
+
+if SNAPSHOT:
+    # Fail instead of stalling on a download if anything still reaches for the hub
+    for _variable in ('HF_HUB_OFFLINE', 'TRANSFORMERS_OFFLINE', 'HF_DATASETS_OFFLINE'):
+        os.environ.setdefault(_variable, '1')
+
+_active = None
+_lock = threading.Lock()
+
+
+class SnapshotError(RuntimeError):
+    """
+    Raised when offline mode cannot serve a model or dataset from the snapshot.
+    """
+
+
+def file_checksum(path):
+    """
+    Returns the hex SHA-256 digest of a file.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _model_dir(model_name):
+    return os.path.join('models', model_name.strip('/\\').replace('/', '--').replace('\\', '--'))
+
+
+def create_snapshot(root, model_names, dataset_name='cnn_dailymail', dataset_config='3.0.0',
+                    split='test', num_samples=None, version=None):
+    """
+    Packs models and a dataset slice into a new snapshot version.
+
+    The version is written to a temporary directory and renamed into place
+    once its manifest is complete, then ``CURRENT`` is pointed at it, so
+    readers never see a partial snapshot.
+
+    Parameters:
+    root (str): The snapshot root directory.
+    model_names (tuple): The models to pack, with their tokenizers.
+    dataset_name (str): The dataset to take the slice from, or None for no dataset.
+    dataset_config (str): The dataset configuration.
+    split (str): The split to take the slice from.
+    num_samples (int): The number of leading rows of the split to pack, or None for all of them.
+    version (str): The version name, defaults to the current UTC time.
+
+    Returns:
+    str: The version directory.
+    """
+    from .startup import export_snapshot
+
+    created = datetime.datetime.now(datetime.timezone.utc)
+    version = version or created.strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(root, version)
+    if os.path.exists(path):
+        raise SnapshotError(f"Snapshot version {path} already exists")
+    staging = path + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'created': created.isoformat(),
+        'models': {},
+        'dataset': None,
+        'files': {},
+    }
+    for model_name in model_names:
+        export_snapshot(model_name, os.path.join(staging, _model_dir(model_name)))
+        manifest['models'][model_name] = _model_dir(model_name)
+
+    if dataset_name:
+        import datasets
+
+        rows = datasets.load_dataset(dataset_name, dataset_config, split=split)
+        if num_samples is not None:
+            rows = rows.select(range(min(num_samples, len(rows))))
+        datasets.DatasetDict({split: rows}).save_to_disk(os.path.join(staging, 'dataset'))
+        manifest['dataset'] = {'name': dataset_name, 'config': dataset_config, 'split': split,
+                               'num_rows': len(rows), 'path': 'dataset'}
+
+    for directory, _, files in os.walk(staging):
+        for name in files:
+            full = os.path.join(directory, name)
+            relative = os.path.relpath(full, staging).replace(os.sep, '/')
+            manifest['files'][relative] = {'size': os.path.getsize(full), 'sha256': file_checksum(full)}
+    with open(os.path.join(staging, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    os.replace(staging, path)
+    with open(os.path.join(root, CURRENT_NAME + '.tmp'), 'w') as f:
+        f.write(version + '\n')
+    os.replace(os.path.join(root, CURRENT_NAME + '.tmp'), os.path.join(root, CURRENT_NAME))
+    return path
+
+
+def resolve_version(path):
+    """
+    Returns the version directory for a snapshot root or version directory.
+    """
+    if os.path.isfile(os.path.join(path, MANIFEST_NAME)):
+        return path
+    try:
+        with open(os.path.join(path, CURRENT_NAME)) as f:
+            return os.path.join(path, f.read().strip())
+    except OSError:
+        raise SnapshotError(f"{path} is neither a snapshot version nor a snapshot root with a {CURRENT_NAME} file")
+
+
+def verify_snapshot(path):
+    """
+    Checks every file of a snapshot version against its manifest.
+
+    Parameters:
+    path (str): A snapshot root or version directory.
+
+    Returns:
+    dict: The manifest, with the version directory added as ``path``.
+    """
+    path = resolve_version(path)
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as exc:
+        raise SnapshotError(f"Cannot read the manifest of snapshot {path}: {exc}")
+    if manifest.get('format') != FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot {path} has format {manifest.get('format')}, expected {FORMAT_VERSION}")
+
+    problems = []
+    for relative, expected in sorted(manifest['files'].items()):
+        full = os.path.join(path, relative)
+        if not os.path.isfile(full):
+            problems.append(f"{relative} is missing")
+        elif os.path.getsize(full) != expected['size']:
+            problems.append(f"{relative} has {os.path.getsize(full)} bytes, expected {expected['size']}")
+        elif file_checksum(full) != expected['sha256']:
+            problems.append(f"{relative} does not match its checksum")
+    if problems:
+        raise SnapshotError(f"Snapshot {path} is corrupt: " + '; '.join(problems))
+    manifest['path'] = path
+    return manifest
+
+
+def active_snapshot():
+    """
+    Returns the verified manifest of the snapshot set by ``SUMMARIZATION_SNAPSHOT``.
+
+    The snapshot is verified once per process, on the first call.
+
+    Returns:
+    dict: The manifest, or None when not running offline.
+    """
+    global _active
+    if not SNAPSHOT:
+        return None
+    with _lock:
+        if _active is None:
+            _active = verify_snapshot(SNAPSHOT)
+    return _active
+
+
+def resolve_model(model_name):
+    """
+    Returns where to load a model from: the snapshot copy when offline, otherwise the name itself.
+    """
+    manifest = active_snapshot()
+    if manifest is None:
+        return model_name
+    if model_name not in manifest['models']:
+        raise SnapshotError(f"Offline snapshot {manifest['path']} has no model {model_name!r}, "
+                            f"only {', '.join(map(repr, manifest['models']))}")
+    return os.path.join(manifest['path'], manifest['models'][model_name])
+
+
+def load_dataset(dataset_name='cnn_dailymail', dataset_config='3.0.0'):
+    """
+    Loads a dataset from the snapshot when offline, otherwise from the hub.
+
+    Offline, only the packed split is available, holding the leading rows
+    of the original split.
+
+    Returns:
+    DatasetDict: The dataset, indexed by split.
+    """
+    manifest = active_snapshot()
+    if manifest is None:
+        import datasets
+
+        return datasets.load_dataset(dataset_name, dataset_config)
+    packed = manifest['dataset']
+    if packed is None or (packed['name'], packed['config']) != (dataset_name, dataset_config):
+        have = f"{packed['name']} {packed['config']}" if packed else "no dataset"
+        raise SnapshotError(f"Offline snapshot {manifest['path']} has {have}, not {dataset_name} {dataset_config}")
+    import datasets
+
+    return datasets.load_from_disk(os.path.join(manifest['path'], packed['path']))
+
+
+def main(argv=None):
+    from .registry import DEFAULT_MODEL
+
+    parser = argparse.ArgumentParser(description="Pack models and a dataset slice for offline use.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    create = subparsers.add_parser('create')
+    create.add_argument('root')
+    create.add_argument('--model', action='append', dest='models',
+                        help=f"A model to pack, can be repeated. Defaults to {DEFAULT_MODEL}.")
+    create.add_argument('--dataset', default='cnn_dailymail', help="The dataset to pack, or '' for none.")
+    create.add_argument('--config', default='3.0.0')
+    create.add_argument('--split', default='test')
+    create.add_argument('--num-samples', type=int, default=None)
+    create.add_argument('--version', default=None)
+    verify = subparsers.add_parser('verify')
+    verify.add_argument('path')
+    args = parser.parse_args(argv)
+
+    if args.command == 'create':
+        path = create_snapshot(args.root, args.models or [DEFAULT_MODEL], args.dataset or None, args.config,
+                               args.split, args.num_samples, args.version)
+        print(f"Wrote snapshot {path}")
+    else:
+        try:
+            manifest = verify_snapshot(args.path)
+        except SnapshotError as exc:
+            sys.exit(f"error: {exc}")
+        print(f"Snapshot {manifest['path']} is intact: {len(manifest['files'])} files, "
+              f"models {', '.join(manifest['models'])}")
+
+
+if __name__ == '__main__':
+    main()
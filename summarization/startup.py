@@ -0,0 +1,223 @@
+"""
+Worker cold start: local weight snapshots and a startup report.
+
+Loading a model by hub id resolves every file against the hub before
+reading the local copy, which adds network round trips to each cold
+start. ``export_snapshot`` writes the config, tokenizer and weights to a
+local directory once; passing that directory as the model name skips the
+hub entirely.
+
+Weights are written as ``model.safetensors``, which ``from_pretrained``
+memory-maps instead of deserializing. Parameters then point into the
+file mapping, so every worker on a host that loads the same snapshot
+shares its pages through the page cache. The int8 and bfloat16
+precisions convert the weights into private copies.
+
+``startup_report`` starts worker processes side by side and reports
+their cold-start time, their memory split into private and shared, and
+how much of the loaded weights is backed by a mapped file.
+
+Usage:
+python -m summarization.startup export facebook/bart-large-cnn ./bart-large-cnn
+python -m summarization.startup report ./bart-large-cnn --workers 4
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from .registry import DEFAULT_MODEL
+
+WEIGHTS_NAME = 'model.safetensors'
+# Modules only evaluation needs, which a serving worker should never import
+EVALUATION_MODULES = ('datasets', 'rouge_score', 'nltk')
+
+
+def export_snapshot(model_name, path):
+    """
+    Writes a model's config, tokenizer and safetensors weights to a local directory.
+
+    Parameters:
+    model_name (str): The Hugging Face model id or local path.
+    path (str): The directory to write.
+    """
+    from transformers import BartForConditionalGeneration, BartTokenizerFast
+
+    BartTokenizerFast.from_pretrained(model_name).save_pretrained(path)
+    BartForConditionalGeneration.from_pretrained(model_name).save_pretrained(path, safe_serialization=True)
+
+
+def memory_usage():
+    """
+    Returns the memory of the current process, split by how much of it is shared.
+
+    PSS charges each shared page to the processes mapping it in equal
+    parts, so the PSS of several workers sums to their real footprint.
+
+    Returns:
+    dict: Resident, proportional and shared resident memory in MB, or zeros where /proc is unavailable.
+    """
+    usage = {'rss_mb': 0.0, 'pss_mb': 0.0, 'shared_mb': 0.0}
+    fields = {'Rss:': 'rss_mb', 'Pss:': 'pss_mb', 'Shared_Clean:': 'shared_mb', 'Shared_Dirty:': 'shared_mb'}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in fields:
+                    usage[fields[parts[0]]] += int(parts[1]) / 2**10
+    except (OSError, ValueError):
+        pass
+    return usage
+
+
+def mapped_weights_fraction(model):
+    """
+    Returns the fraction of a model's parameter bytes that live in a mapped safetensors file.
+
+    Parameters:
+    model: A loaded torch model.
+
+    Returns:
+    float: Between 0 and 1, or None where /proc is unavailable.
+    """
+    try:
+        with open('/proc/self/maps') as f:
+            ranges = []
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 6 and fields[5].endswith('.safetensors'):
+                    start, end = fields[0].split('-')
+                    ranges.append((int(start, 16), int(end, 16)))
+    except OSError:
+        return None
+
+    total = mapped = 0
+    for parameter in model.parameters():
+        size = parameter.element_size() * parameter.nelement()
+        total += size
+        if any(start <= parameter.data_ptr() < end for start, end in ranges):
+            mapped += size
+    return mapped / total if total else 0.0
+
+
+def _start_worker(model_name, launched, barrier, results, timeout):
+    # The package has already been imported by the spawn bootstrap to unpickle this function
+    started = time.time()
+    try:
+        from .core import summarize
+        from .registry import registry
+
+        loaded = registry.get(model_name)
+        summarize_started = time.time()
+        summarize("Cold start check. The model summarizes one short text.", model_name=model_name,
+                  max_length=20, min_length=5, num_beams=1, cache=None)
+        ready = time.time()
+        # Measure once every worker has loaded, so pages mapped by all of them count as shared
+        barrier.wait(timeout)
+        report = {
+            'startup_seconds': started - launched,
+            'load_seconds': loaded.load_seconds,
+            'first_summary_seconds': ready - summarize_started,
+            'cold_start_seconds': ready - launched,
+            'mapped_weights_fraction': (mapped_weights_fraction(loaded.model) if loaded.backend.name == 'torch'
+                                        else None),
+            'evaluation_modules_imported': [name for name in EVALUATION_MODULES if name in sys.modules],
+        }
+        report.update(memory_usage())
+    except threading.BrokenBarrierError:
+        results.put({'error': "another worker failed or timed out before all of them were up"})
+        return
+    except Exception as exc:
+        # Release the workers waiting at the barrier, they would otherwise wait for this one forever
+        barrier.abort()
+        results.put({'error': f"{type(exc).__name__}: {exc}"})
+        return
+    results.put(report)
+    # Stay up until every worker has measured its memory
+    try:
+        barrier.wait(timeout)
+    except threading.BrokenBarrierError:
+        pass
+
+
+def startup_report(model_names=(DEFAULT_MODEL,), workers=2, timeout=600):
+    """
+    Measures cold start and memory of worker processes running side by side.
+
+    Each worker is a fresh interpreter that imports the package, loads the
+    model and summarizes one text. Startup covers the interpreter and the
+    package imports, and cold start lasts until the first summary is done.
+    Memory is read once all workers for a model are up.
+
+    Parameters:
+    model_names (tuple): The models to compare, e.g. a hub id and its local snapshot.
+    workers (int): The number of concurrent worker processes.
+    timeout (float): Seconds the workers of one model may take to start up and report.
+
+    Returns:
+    dict: For each model, the per-worker timings and memory, the mean cold start and the summed PSS.
+
+    Raises:
+    RuntimeError: If a worker failed or did not report within the timeout.
+    """
+    import multiprocessing
+    import queue
+
+    context = multiprocessing.get_context('spawn')
+    report = {}
+    for model_name in model_names:
+        barrier, results = context.Barrier(workers), context.Queue()
+        processes = [context.Process(target=_start_worker,
+                                     args=(model_name, time.time(), barrier, results, timeout))
+                     for _ in range(workers)]
+        deadline = time.time() + timeout
+        try:
+            for process in processes:
+                process.start()
+            try:
+                per_worker = [results.get(timeout=max(0.0, deadline - time.time())) for _ in processes]
+            except queue.Empty:
+                raise RuntimeError(f"{model_name}: workers did not report within {timeout:g}s") from None
+            errors = list(dict.fromkeys(w['error'] for w in per_worker if 'error' in w))
+            if errors:
+                raise RuntimeError(f"{model_name}: worker failed: {'; '.join(errors)}")
+            for process in processes:
+                process.join(max(0.0, deadline - time.time()))
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+        report[model_name] = {
+            'workers': per_worker,
+            'mean_cold_start_seconds': sum(w['cold_start_seconds'] for w in per_worker) / workers,
+            'total_pss_mb': sum(w['pss_mb'] for w in per_worker),
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export local model snapshots and measure worker cold start.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export = subparsers.add_parser('export')
+    export.add_argument('model')
+    export.add_argument('path')
+    report = subparsers.add_parser('report')
+    report.add_argument('models', nargs='*', default=[DEFAULT_MODEL])
+    report.add_argument('--workers', type=int, default=2)
+    report.add_argument('--timeout', type=float, default=600, help="Seconds each model's workers may take.")
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        export_snapshot(args.model, args.path)
+        print(f"Wrote {args.model} to {args.path}")
+    else:
+        try:
+            report = startup_report(args.models, args.workers, args.timeout)
+        except RuntimeError as exc:
+            sys.exit(f"error: {exc}")
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
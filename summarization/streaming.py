@@ -0,0 +1,143 @@
+"""
+Token-by-token summary streaming.
+
+``model.generate`` runs on a background thread and pushes each new token
+into a ``TextIteratorStreamer``; the caller iterates over decoded text as
+it is produced. Streaming only supports a single hypothesis, so it
+decodes greedily or by sampling rather than with beam search.
+"""
+import time
+
+from . import metrics
+from .cache import cache_key, encoder_cache, summary_cache
+from .core import MAX_INPUT_TOKENS, PREFIX
+from .executor import submit_inference
+from .registry import DEFAULT_DEVICE, DEFAULT_DTYPE, DEFAULT_MODEL, registry
+
+
+class SummaryStream:
+    """
+    An iterator over the pieces of a summary as they are generated.
+
+    Attributes:
+    text (str): The summary generated so far.
+    time_to_first_token (float): Seconds from the start of the request to the first piece of text, or None.
+    total_seconds (float): Seconds from the start of the request to the end of generation, or None.
+    cached (bool): Whether the summary came from the cache instead of the model.
+    """
+
+    def __init__(self, pieces, started, cached=False):
+        self._pieces = pieces
+        self._started = started
+        self.text = ''
+        self.time_to_first_token = None
+        self.total_seconds = None
+        self.cached = cached
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for piece in self._pieces:
+            if not piece:
+                continue
+            if self.time_to_first_token is None:
+                self.time_to_first_token = time.perf_counter() - self._started
+            self.text += piece
+            return piece
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self._started
+        raise StopIteration
+
+
+def stream_summarize(text, max_length=150, min_length=30, do_sample=False, temperature=1.0, top_p=1.0,
+                     model_name=DEFAULT_MODEL, dtype=DEFAULT_DTYPE, device=DEFAULT_DEVICE, cache=summary_cache,
+                     encoder_cache=encoder_cache):
+    """
+    Summarizes the given text, yielding the summary as it is generated.
+
+    Parameters:
+    text (str): The text to be summarized.
+    max_length (int): The maximum length of the summary.
+    min_length (int): The minimum length of the summary.
+    do_sample (bool): Sample from the model instead of decoding greedily.
+    temperature (float): The sampling temperature, used when do_sample is set.
+    top_p (float): The nucleus sampling threshold, used when do_sample is set.
+    model_name (str): The model to summarize with.
+    dtype (str): The inference precision: float32, int8 or bfloat16.
+    device (str): The device the model runs on.
+    cache (SummaryCache): The cache greedy summaries are looked up in and stored to, or None.
+    encoder_cache (EncoderCache): The cache of encoder outputs, see ``summarize``.
+
+    Returns:
+    SummaryStream: Iterates over the decoded pieces of the summary.
+    """
+    started = time.perf_counter()
+    # Sampled summaries differ between calls, so only greedy ones are cached
+    key = None
+    if cache is not None and not do_sample:
+        key = cache_key(text, max_length=max_length, min_length=min_length, num_beams=1,
+                        model_name=model_name, dtype=dtype, backend=registry.backend,
+                        max_input_tokens=MAX_INPUT_TOKENS)
+        summary = cache.get(key)
+        if summary is not None:
+            return SummaryStream(iter([summary]), started, cached=True)
+
+    return SummaryStream(_generate_pieces(text, key, cache, max_length, min_length, do_sample, temperature, top_p,
+                                          model_name, dtype, device, encoder_cache), started)
+
+
+def _generate_pieces(text, key, cache, max_length, min_length, do_sample, temperature, top_p,
+                     model_name, dtype, device, encoder_cache):
+    import torch
+    from transformers import TextIteratorStreamer
+
+    loaded = registry.get(model_name, dtype, device)
+    tokenizer, model = loaded.tokenizer, loaded.model
+    record = metrics.StageRecord(1, 1) if metrics.enabled() else None
+    tokenize_started = time.perf_counter()
+
+    inputs = tokenizer.encode(PREFIX + text, return_tensors='pt', max_length=MAX_INPUT_TOKENS, truncation=True)
+    inputs = inputs.to(device)
+    attention_mask = torch.ones_like(inputs)
+    tokenized = time.perf_counter()
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    kwargs = dict(max_length=max_length, min_length=min_length, num_beams=1, do_sample=do_sample, streamer=streamer)
+    if do_sample:
+        kwargs.update(temperature=temperature, top_p=top_p)
+
+    started = {}
+
+    def run():
+        try:
+            # The encoder runs before generate so its outputs can come from the cache
+            started['encode'] = time.perf_counter()
+            if encoder_cache is not None:
+                encoder_outputs = encoder_cache.encode(loaded, inputs, attention_mask)
+            else:
+                encoder_outputs = loaded.backend.encode(inputs, attention_mask)
+            started['decode'] = time.perf_counter()
+            return model.generate(encoder_outputs=encoder_outputs, attention_mask=attention_mask, **kwargs)
+        except BaseException:
+            # Unblock the consumer, which would otherwise wait for tokens forever
+            streamer.end()
+            raise
+
+    # Queued to the inference executor if one is installed, see summarization.executor
+    future = submit_inference(run)
+    pieces = []
+    for piece in streamer:
+        pieces.append(piece)
+        yield piece
+    summary_ids = future.result()
+    if record is not None:
+        # Time queued for the executor is left out. The streamer detokenizes
+        # as it goes, so that is counted as decode time here.
+        record.seconds['tokenize'] = tokenized - tokenize_started
+        record.seconds['encode'] = started['decode'] - started['encode']
+        record.seconds['decode'] = time.perf_counter() - started['decode']
+        record.input_tokens = inputs.shape[1]
+        record.output_tokens = int((summary_ids[0] != model.config.pad_token_id).sum())
+        metrics.emit(record)
+    if key is not None:
+        cache.put(key, ''.join(pieces).strip())
@@ -0,0 +1,131 @@
+import threading
+
+import pytest
+
+from summarization.batching import BatchScheduler
+
+
+class RecordingSummarizer:
+    """
+    Stands in for summarize_batch, recording the texts of every call.
+    """
+
+    def __init__(self, release=None):
+        self.calls = []
+        self.entered = threading.Event()
+        self.release = release
+
+    def __call__(self, texts, **params):
+        self.calls.append(list(texts))
+        self.entered.set()
+        if self.release is not None:
+            self.release.wait(5)
+        return [text.upper() for text in texts]
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(**options):
+        scheduler = BatchScheduler(**options)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_concurrent_requests_share_a_batch(make_scheduler):
+    summarizer = RecordingSummarizer()
+    scheduler = make_scheduler(max_batch_size=4, max_wait_ms=200, summarize_fn=summarizer)
+    futures = [scheduler.submit(text) for text in ['a', 'b', 'c', 'd']]
+
+    assert [future.result(5) for future in futures] == ['A', 'B', 'C', 'D']
+    assert summarizer.calls == [['a', 'b', 'c', 'd']]
+    stats = scheduler.stats.as_dict()
+    assert stats['batches'] == 1
+    assert stats['requests'] == 4
+    assert stats['fill_rate'] == 1.0
+    assert stats['max_queue_delay'] >= stats['mean_queue_delay'] >= 0
+
+
+def test_fill_rate_of_partial_batches(make_scheduler):
+    summarizer = RecordingSummarizer()
+    scheduler = make_scheduler(max_batch_size=4, max_wait_ms=0, summarize_fn=summarizer)
+    for text in ['a', 'b']:
+        assert scheduler.summarize(text, timeout=5) == text.upper()
+
+    assert scheduler.stats.batches == 2
+    assert scheduler.stats.fill_rate == 2 / 8
+
+
+def test_different_parameters_are_not_batched_together(make_scheduler):
+    summarizer = RecordingSummarizer()
+    scheduler = make_scheduler(max_batch_size=4, max_wait_ms=200, summarize_fn=summarizer)
+    futures = [scheduler.submit('a', num_beams=1), scheduler.submit('b', num_beams=4),
+               scheduler.submit('c', num_beams=1)]
+
+    assert [future.result(5) for future in futures] == ['A', 'B', 'C']
+    assert sorted(summarizer.calls) == [['a', 'c'], ['b']]
+
+
+def test_cancelled_request_is_skipped_and_worker_survives(make_scheduler):
+    release = threading.Event()
+    summarizer = RecordingSummarizer(release)
+    scheduler = make_scheduler(max_batch_size=4, max_wait_ms=0, summarize_fn=summarizer)
+
+    first = scheduler.submit('first')
+    assert summarizer.entered.wait(5)
+    # Queued behind the running batch, then cancelled before the worker picks it up
+    cancelled = scheduler.submit('cancelled')
+    assert cancelled.cancel()
+    release.set()
+
+    assert first.result(5) == 'FIRST'
+    assert scheduler.submit('later').result(5) == 'LATER'
+    assert cancelled.cancelled()
+    assert ['cancelled'] not in summarizer.calls
+    assert scheduler._worker.is_alive()
+
+
+def test_failed_batch_does_not_stop_the_worker(make_scheduler):
+    def summarize_fn(texts, **params):
+        if 'bad' in texts:
+            raise RuntimeError("generation failed")
+        return list(texts)
+
+    scheduler = make_scheduler(max_batch_size=1, max_wait_ms=0, summarize_fn=summarize_fn)
+    with pytest.raises(RuntimeError, match="generation failed"):
+        scheduler.summarize('bad', timeout=5)
+    assert scheduler.summarize('good', timeout=5) == 'good'
+
+
+def test_length_function_failure_does_not_stop_the_worker(make_scheduler):
+    def length_fn(texts, **params):
+        if 'bad' in texts:
+            raise ValueError("cannot tokenize")
+        return [len(text) for text in texts]
+
+    scheduler = make_scheduler(max_batch_size=1, max_wait_ms=0, summarize_fn=RecordingSummarizer(),
+                               token_budget=100, length_fn=length_fn)
+    with pytest.raises(ValueError):
+        scheduler.summarize('bad', timeout=5)
+    assert scheduler.summarize('good', timeout=5) == 'GOOD'
+
+
+def test_token_budget_splits_batches_and_records_padding(make_scheduler):
+    summarizer = RecordingSummarizer()
+    lengths = {'s1': 10, 's2': 10, 'l1': 100, 'l2': 100}
+    scheduler = make_scheduler(max_batch_size=4, max_wait_ms=200, summarize_fn=summarizer, token_budget=200,
+                               length_fn=lambda texts, **params: [lengths[text] for text in texts])
+    futures = [scheduler.submit(text) for text in ['l1', 's1', 'l2', 's2']]
+
+    assert [future.result(5) for future in futures] == ['L1', 'S1', 'L2', 'S2']
+    assert sorted(summarizer.calls) == [['l1', 'l2'], ['s1', 's2']]
+    padding = scheduler.padding.as_dict()
+    assert padding['tokens'] == 220
+    assert padding['padded_before'] == 400
+    assert padding['padded_after'] == 220
+    assert padding['padding_ratio_after'] == 0.0
@@ -0,0 +1,23 @@
+import json
+
+from summarization import cli
+
+
+def test_completed_ids_cuts_a_partial_last_line(tmp_path, monkeypatch):
+    # A small chunk makes the search for the last newline span several reads
+    monkeypatch.setattr(cli, 'TAIL_CHUNK_BYTES', 16)
+    path = tmp_path / 'summaries.jsonl'
+    complete = ''.join(json.dumps({'id': str(i), 'summary': 'a summary ' * 10}) + '\n' for i in range(3))
+    path.write_text(complete + '{"id": "3", "summary": "cut off mid-wri')
+
+    assert cli.completed_ids(str(path)) == {'0', '1', '2'}
+    assert path.read_text() == complete
+
+
+def test_completed_ids_of_a_single_partial_line(tmp_path):
+    path = tmp_path / 'summaries.jsonl'
+    path.write_text('{"id": "0", "summ')
+
+    assert cli.completed_ids(str(path)) == set()
+    assert path.read_text() == ''
+    assert cli.completed_ids(str(tmp_path / 'missing.jsonl')) == set()
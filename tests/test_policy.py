@@ -0,0 +1,29 @@
+from summarization import metrics, policy
+from summarization.metrics import StageRecord
+from summarization.policy import LatencyModel
+
+
+def make_record(batch_size, input_tokens, output_tokens, encode, decode):
+    record = StageRecord(batch_size, 1)
+    record.input_tokens = input_tokens
+    record.output_tokens = output_tokens
+    record.seconds.update(encode=encode, decode=decode)
+    return record
+
+
+def test_import_does_not_register_the_calibration_hook():
+    assert policy.default_policy.latency_model not in metrics._hooks
+
+
+def test_batched_records_do_not_calibrate():
+    model = LatencyModel()
+    before = (model.encode, model.step)
+    model(make_record(8, 4000, 800, encode=1.0, decode=20.0))
+    assert (model.encode, model.step) == before
+
+
+def test_single_records_calibrate():
+    model = LatencyModel(encode=0.0004, step=0.03)
+    model(make_record(1, 100, 50, encode=0.1, decode=1.0))
+    assert model.encode > 0.0004
+    assert model.step < 0.03
@@ -0,0 +1,64 @@
+import pytest
+
+from summarization.benchmark import load_corpus
+from summarization.longdoc import split_sentences
+from summarization.rouge import FastRougeScorer, check_parity, lcs_length
+
+pytest.importorskip('rouge_score')
+
+
+@pytest.fixture(scope='module')
+def sentences():
+    return [sentence for document in load_corpus() for sentence in split_sentences(document)]
+
+
+@pytest.mark.parametrize('use_stemmer', [True, False])
+def test_parity_on_fixture_corpus(sentences, use_stemmer):
+    # Every sentence against every other: overlapping, disjoint and identical pairs
+    pairs = [(a, b) for a in sentences for b in sentences]
+    assert check_parity(pairs, use_stemmer=use_stemmer) == []
+
+
+def test_parity_on_edge_cases(sentences):
+    pairs = [
+        ('', sentences[0]),
+        (sentences[0], ''),
+        ('', ''),
+        ('!!! ...', sentences[0]),
+        ('The cat sat on the mat.', 'Quarterly revenue rose sharply.'),
+        ('running runs ran', 'run running runner'),
+        ('a a a b', 'a b b b'),
+    ]
+    assert check_parity(pairs) == []
+
+
+def test_lcs_length_matches_dynamic_programming():
+    def reference(a, b):
+        table = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+        for i in range(1, len(a) + 1):
+            for j in range(1, len(b) + 1):
+                if a[i - 1] == b[j - 1]:
+                    table[i][j] = table[i - 1][j - 1] + 1
+                else:
+                    table[i][j] = max(table[i - 1][j], table[i][j - 1])
+        return table[-1][-1]
+
+    words = 'the cat sat on a mat and the dog ran'.split()
+    for i in range(len(words)):
+        a, b = words[i:] + words[:i], words[::-1][i:]
+        assert lcs_length(a, b) == reference(a, b)
+    assert lcs_length([], words) == 0
+
+
+def test_unsupported_rouge_type():
+    with pytest.raises(ValueError):
+        FastRougeScorer(['rougeLsum'])
+
+
+def test_score_batch_with_a_reused_pool_matches_in_process(sentences):
+    scorer = FastRougeScorer(['rouge1', 'rouge2', 'rougeL'], use_stemmer=True)
+    pairs = [(a, b) for a in sentences[:16] for b in sentences[:16]]
+    expected = scorer.score_batch(pairs)
+    with scorer.pool(2) as pool:
+        for _ in range(2):
+            assert scorer.score_batch(pairs, chunksize=16, pool=pool) == expected
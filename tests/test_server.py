@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from summarization import server as server_module
+from summarization.server import HTTPError, SummarizationServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    calls = []
+
+    def summarize_batch(texts, **params):
+        calls.append(list(texts))
+        return [text.upper() for text in texts]
+
+    monkeypatch.setattr(server_module, 'summarize_batch', summarize_batch)
+    server = SummarizationServer(token_budget=250)
+    server.calls = calls
+    # Stands in for the tokenizer: the length is the number given in the text
+    monkeypatch.setattr(server, '_token_lengths', lambda texts: [int(text[1:]) for text in texts])
+    yield server
+    server.executor.shutdown()
+
+
+def test_batch_is_bucketed_and_keeps_the_request_order(server):
+    texts = ['l100', 's10', 'l101', 's11']
+    status, payload = asyncio.run(server.summarize_batch({'texts': texts}))
+
+    assert status == 200
+    assert payload['summaries'] == ['L100', 'S10', 'L101', 'S11']
+    assert server.calls == [['s10', 's11'], ['l100', 'l101']]
+    status, health = asyncio.run(server.health())
+    assert health['padding']['tokens'] == 222
+    assert health['padding']['padded_before'] == 404
+    assert health['padding']['padded_after'] == 224
+
+
+def test_batch_limits(server):
+    with pytest.raises(HTTPError) as error:
+        asyncio.run(server.summarize_batch({'texts': ['s1'] * (server_module.MAX_BATCH_TEXTS + 1)}))
+    assert error.value.status == 413
+    with pytest.raises(HTTPError) as error:
+        asyncio.run(server.summarize_batch({'texts': ['s1'], 'num_beams': 64}))
+    assert error.value.status == 400